@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Language, Submission, JudgeServer
+from .models import Language, Submission, JudgeServer, RejudgeJob
+from .rejudge import cancel_job
+from apps.problems.models import Problem
 
 
 @admin.register(Language)
@@ -43,10 +45,11 @@ class SubmissionAdmin(admin.ModelAdmin):
         'created_at'
     ]
     list_filter = [
-        'status', 'result', 'language',
+        'status', 'result', 'language', 'priority', 'judge_server',
         'created_at', 'is_public'
     ]
     search_fields = ['user__username', 'problem__title', 'ip_address']
+    list_select_related = ['user', 'problem', 'language']
     readonly_fields = [
         'id', 'user', 'problem', 'language',
         'code_length', 'ip_address', 'user_agent',
@@ -64,7 +67,8 @@ class SubmissionAdmin(admin.ModelAdmin):
         }),
         ('判题信息', {
             'fields': (
-                'status', 'result', 'score', 'total_score', 'pass_rate',
+                'status', 'priority', 'judge_server', 'lease_expires_at', 'judge_deadline', 'judge_attempts',
+                'result', 'score', 'total_score', 'pass_rate',
                 'time_used', 'memory_used',
                 'test_cases_passed', 'test_cases_total'
             )
@@ -92,6 +96,17 @@ class SubmissionAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """列表页不加载代码、判题详情等大字段，编辑页读取完整记录"""
+        queryset = super().get_queryset(request)
+        changelist = f'{self.opts.app_label}_{self.opts.model_name}_changelist'
+        if request.resolver_match and request.resolver_match.url_name == changelist:
+            queryset = queryset.defer(
+                *Submission.HEAVY_FIELDS,
+                *[f'problem__{field}' for field in Problem.HEAVY_FIELDS]
+            )
+        return queryset
+    
     def problem_link(self, obj):
         """题目链接"""
         return format_html(
@@ -251,3 +266,39 @@ class JudgeServerAdmin(admin.ModelAdmin):
         """任务显示"""
         return f"{obj.task_count}/{obj.max_tasks}"
     task_display.short_description = '当前任务'
+
+
+
+@admin.register(RejudgeJob)
+class RejudgeJobAdmin(admin.ModelAdmin):
+    """重新判题任务管理"""
+    
+    list_display = [
+        'id', 'problem', 'created_by', 'status',
+        'progress_display', 'changed', 'created_at', 'finished_at'
+    ]
+    list_filter = ['status', 'created_at']
+    search_fields = ['problem__title']
+    readonly_fields = [
+        'status', 'total', 'enqueued', 'judged', 'changed',
+        'last_submission_id', 'created_by', 'created_at', 'finished_at'
+    ]
+    ordering = ['-created_at']
+    actions = ['cancel_jobs']
+    
+    def progress_display(self, obj):
+        """进度"""
+        return f'{obj.judged}/{obj.total} ({obj.progress}%)'
+    progress_display.short_description = '进度'
+    
+    def has_add_permission(self, request):
+        """任务通过题目管理的“重新判题”操作或API创建"""
+        return False
+    
+    def cancel_jobs(self, request, queryset):
+        """取消选中的任务"""
+        jobs = list(queryset.filter(status='running'))
+        for job in jobs:
+            cancel_job(job)
+        self.message_user(request, f'已取消 {len(jobs)} 个任务')
+    cancel_jobs.short_description = '取消选中的任务'
@@ -0,0 +1,115 @@
+"""
+输出比对
+以二进制流逐块读取用户输出和标准输出并同步比较，内存占用与输出大小无关，
+遇到第一处差异即停止。
+
+比对规则：忽略输出整体的首尾空白、每行的行尾空白和空行（只含空白的行），
+行首空白和行内空白需要完全一致。
+"""
+
+
+# 行内空白字符（与 bytes.strip() 一致，换行单独处理）
+LINE_WHITESPACE = b' \t\r\x0b\x0c'
+
+# 每次读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 差异处截取的片段长度
+SNIPPET_SIZE = 40
+
+
+def normalized_chunks(stream, chunk_size=CHUNK_SIZE):
+    """
+    逐块产出规范化后的输出：非空行去掉行尾空白，以换行连接，第一行去掉行首空白
+
+    只有一行中尚未确定是否为行尾的空白需要暂存，其余数据读到即产出
+    """
+    started = False            # 是否已产出内容，此前的空白都属于输出开头
+    line_has_content = False   # 当前行是否已产出内容
+    pending_newline = False    # 上一个非空行结束，下次产出内容前先补换行
+    pending_space = bytearray()  # 当前行中暂存的空白
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+
+        for index, segment in enumerate(chunk.split(b'\n')):
+            if index > 0:
+                # 换行：暂存的空白是行尾空白，丢弃
+                pending_space.clear()
+                if line_has_content:
+                    pending_newline = True
+                line_has_content = False
+
+            content = segment.rstrip(LINE_WHITESPACE)
+            if not content:
+                if started:
+                    pending_space += segment
+                continue
+
+            if started:
+                out = (b'\n' if pending_newline else b'') + bytes(pending_space) + content
+            else:
+                out = content.lstrip(LINE_WHITESPACE)
+                started = True
+            yield out
+
+            pending_newline = False
+            line_has_content = True
+            pending_space = bytearray(segment[len(content):])
+
+
+def compare_output(actual, expected, chunk_size=CHUNK_SIZE):
+    """
+    比较两个二进制流（用户输出、标准输出）
+
+    相同返回None，否则返回第一处差异：
+    {'line': 行号, 'column': 列号, 'expected': 标准输出片段, 'actual': 用户输出片段}
+    行号按规范化后的非空行计数，列号按字节计数，都从1开始
+    """
+    actual_chunks = normalized_chunks(actual, chunk_size)
+    expected_chunks = normalized_chunks(expected, chunk_size)
+    actual_buf = b''
+    expected_buf = b''
+    line, column = 1, 1
+
+    while True:
+        if not actual_buf:
+            actual_buf = next(actual_chunks, b'')
+        if not expected_buf:
+            expected_buf = next(expected_chunks, b'')
+        if not actual_buf and not expected_buf:
+            return None
+
+        size = min(len(actual_buf), len(expected_buf))
+        if actual_buf[:size] == expected_buf[:size] and size > 0:
+            line, column = _advance(line, column, actual_buf[:size])
+            actual_buf = actual_buf[size:]
+            expected_buf = expected_buf[size:]
+            continue
+
+        # 找到第一个不同的字节（其中一方已结束时就是当前位置）
+        offset = 0
+        while offset < size and actual_buf[offset] == expected_buf[offset]:
+            offset += 1
+        line, column = _advance(line, column, actual_buf[:offset])
+        return {
+            'line': line,
+            'column': column,
+            'expected': _snippet(expected_buf[offset:]),
+            'actual': _snippet(actual_buf[offset:]),
+        }
+
+
+def _advance(line, column, data):
+    """根据已比对的数据推进行列位置"""
+    newlines = data.count(b'\n')
+    if newlines:
+        return line + newlines, len(data) - data.rfind(b'\n')
+    return line, column + len(data)
+
+
+def _snippet(data):
+    """截取差异处到行尾的一小段，用于展示"""
+    return data[:SNIPPET_SIZE].split(b'\n', 1)[0].decode('utf-8', errors='replace')
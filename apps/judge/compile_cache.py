@@ -0,0 +1,144 @@
+"""
+编译产物缓存
+按 (源代码, 编译命令, 镜像) 的哈希保存编译出的可执行文件和编译错误，
+相同代码重复提交时直接复用，不再启动编译
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+
+# 工作目录中编译产物的文件名
+ARTIFACT_NAME = 'main'
+
+
+class CompileCache:
+    """本地磁盘上的编译缓存，按最近使用时间淘汰"""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or settings.JUDGE_COMPILE_CACHE_DIR
+        self.max_bytes = max_bytes or settings.JUDGE_COMPILE_CACHE_SIZE * 1024 * 1024
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 首次写入时统计
+
+    @staticmethod
+    def make_key(source, compile_command, image_id):
+        """计算缓存键"""
+        sha = hashlib.sha256()
+        for part in (source, compile_command, image_id or ''):
+            sha.update(part.encode('utf-8'))
+            sha.update(b'\0')
+        return sha.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def load(self, key, workspace):
+        """读取缓存，命中时把可执行文件复制到工作目录，返回编译结果"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            artifact = os.path.join(entry_dir, ARTIFACT_NAME)
+            if meta['success'] and os.path.exists(artifact):
+                shutil.copy2(artifact, os.path.join(workspace, ARTIFACT_NAME))
+            # 更新使用时间，供LRU淘汰
+            os.utime(entry_dir)
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return {'success': meta['success'], 'error': meta.get('error', '')}
+
+    def store(self, key, result, workspace):
+        """保存编译结果和工作目录中的可执行文件"""
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+
+        # 编译产物由沙箱内的程序生成，符号链接等非普通文件不缓存，避免复制宿主机上的文件
+        artifact = os.path.join(workspace, ARTIFACT_NAME)
+        if os.path.islink(artifact) or (os.path.exists(artifact) and not os.path.isfile(artifact)):
+            return
+
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='tmp_', dir=os.path.dirname(entry_dir))
+        try:
+            size = 0
+            if result['success'] and os.path.exists(artifact):
+                shutil.copy2(artifact, os.path.join(tmp_dir, ARTIFACT_NAME))
+                size += os.path.getsize(artifact)
+
+            meta = {
+                'success': result['success'],
+                'error': result.get('error', ''),
+                'created_at': time.time(),
+            }
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            size += os.path.getsize(os.path.join(tmp_dir, 'meta.json'))
+
+            # 原子地放入缓存，并发写入同一个键时只保留先完成的
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        self._add_bytes(size)
+
+    def _add_bytes(self, size):
+        """累计缓存大小，超出上限时淘汰最久未使用的条目"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += size
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            entries = sorted(self._scan(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            for entry_dir, size, _ in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+            self._total_bytes = total
+
+    def _scan(self):
+        """遍历缓存条目，返回 [(目录, 大小, 最后使用时间)]"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if not entry.is_dir() or entry.name.startswith('tmp_'):
+                    continue
+                try:
+                    size = sum(item.stat().st_size for item in os.scandir(entry.path))
+                    entries.append((entry.path, size, entry.stat().st_mtime))
+                except OSError:
+                    # 其他进程正在淘汰该条目
+                    continue
+        return entries
+
+
+_cache = None
+
+
+def get_compile_cache():
+    """获取进程内共享的编译缓存，未启用时返回None"""
+    global _cache
+    if not settings.JUDGE_COMPILE_CACHE:
+        return None
+    if _cache is None:
+        _cache = CompileCache()
+    return _cache
@@ -0,0 +1,19 @@
+"""
+提交是否计入统计
+题目、用户题目状态和用户资料的提交数都按这里的定义统计（判题时增量更新和重建时相同）：
+编译错误和系统错误不计入，尚未判出结果的提交也不计入
+"""
+
+from django.db.models import Q
+
+
+# 不计入提交数的判题结果
+UNCOUNTED_RESULTS = ('CE', 'SE')
+
+# 计入提交数的提交（用于查询）
+COUNTED_FILTER = Q(result__isnull=False) & ~Q(result__in=UNCOUNTED_RESULTS)
+
+
+def counted(result):
+    """该判题结果是否计入提交数"""
+    return result is not None and result not in UNCOUNTED_RESULTS
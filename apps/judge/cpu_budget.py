@@ -0,0 +1,80 @@
+"""
+判题节点CPU预算
+每个CPU对应一个文件锁，同一节点上所有判题进程/线程共享，
+保证同一时刻每个CPU上只运行一个测试用例，计时才公平
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows开发环境没有fcntl，不做CPU限制
+    fcntl = None
+
+
+class CpuBudget:
+    """节点级CPU预算"""
+
+    def __init__(self, cpus=None, lock_dir=None):
+        if cpus is None:
+            cpus = settings.JUDGE_CPU_SET or self._available_cpus()
+        self.cpus = list(cpus)
+        self.lock_dir = lock_dir or settings.JUDGE_CPU_LOCK_DIR
+
+    @staticmethod
+    def _available_cpus():
+        if hasattr(os, 'sched_getaffinity'):
+            return sorted(os.sched_getaffinity(0))
+        return list(range(os.cpu_count() or 1))
+
+    @contextmanager
+    def reserve(self, count):
+        """申请最多count个CPU，至少拿到一个才返回，退出时释放"""
+        if fcntl is None:
+            yield []
+            return
+
+        os.makedirs(self.lock_dir, exist_ok=True)
+        acquired = []  # [(cpu, fd)]
+        try:
+            while True:
+                for cpu in self.cpus:
+                    if len(acquired) >= count:
+                        break
+                    fd = self._try_lock(cpu)
+                    if fd is not None:
+                        acquired.append((cpu, fd))
+                if acquired:
+                    break
+                time.sleep(0.05)
+            yield [cpu for cpu, _ in acquired]
+        finally:
+            for _, fd in acquired:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def _try_lock(self, cpu):
+        """尝试锁定一个CPU，成功返回文件描述符"""
+        path = os.path.join(self.lock_dir, f'cpu{cpu}.lock')
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+
+_budget = None
+
+
+def get_cpu_budget():
+    """获取进程内共享的CPU预算"""
+    global _budget
+    if _budget is None:
+        _budget = CpuBudget()
+    return _budget
@@ -0,0 +1,138 @@
+"""
+判题节点
+每个判题进程在 judge_servers 表中登记为一个节点，后台线程定期上报心跳和负载，
+判题进程按 max_tasks - task_count 从队列领取任务。心跳同时为本节点正在判的提交续租，
+心跳超时的节点视为离线，它手上的提交在租约过期后被其他节点收回。
+"""
+
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .judge_queue import reap_expired_leases, release_submissions, renew_leases
+from .models import JudgeServer, Submission
+from .rejudge import advance_rejudge_jobs
+
+
+class JudgeNode:
+    """当前进程对应的判题节点"""
+
+    def __init__(self, max_tasks, hostname=None):
+        self.hostname = hostname or settings.JUDGE_NODE_NAME or socket.gethostname()
+        self.max_tasks = max_tasks
+        self.server = None
+        self.last_beat = None  # 最近一次成功上报心跳的时间
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self):
+        """登记节点（已存在时更新地址和任务数上限并标记为可用）"""
+        self.server, _ = JudgeServer.objects.update_or_create(
+            hostname=self.hostname,
+            defaults={
+                'ip_address': _local_ip(),
+                'is_available': True,
+                'task_count': 0,
+                'max_tasks': self.max_tasks,
+                'last_heartbeat': timezone.now(),
+            },
+        )
+        # 同名节点重启前没判完的提交不必等租约过期
+        release_submissions(Submission.objects.filter(judge_server=self.server), '判题节点重启')
+        self.last_beat = timezone.now()
+        print(f"[JudgeNode] 节点已登记: {self.hostname} (最大任务数 {self.server.max_tasks})")
+        return self.server
+
+    def start(self, get_task_count):
+        """启动心跳线程，get_task_count 返回当前正在判的提交数"""
+        self._thread = threading.Thread(
+            target=self._heartbeat_loop,
+            args=(get_task_count,),
+            name='judge-heartbeat',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """停止心跳并标记为不可用"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        JudgeServer.objects.filter(pk=self.server.pk).update(is_available=False, task_count=0)
+
+    def capacity(self, running):
+        """
+        还能领取的任务数：max_tasks - 正在判的任务数
+
+        管理员可以在后台调低 max_tasks 或停用节点，心跳时读回生效；
+        超过一个租约时长没能成功上报心跳时也不领取，此时本节点的租约可能已被收回
+        """
+        if not (self.server.is_active and self.server.is_available):
+            return 0
+        if self.last_beat is None or timezone.now() - self.last_beat > timedelta(seconds=settings.JUDGE_LEASE_TIMEOUT):
+            return 0
+        return max(0, min(self.server.max_tasks, self.max_tasks) - running)
+
+    def heartbeat(self, task_count):
+        """上报负载并续租，读回管理员修改的 max_tasks / is_active"""
+        cpu_usage, memory_usage = _system_load()
+        now = timezone.now()
+        JudgeServer.objects.filter(pk=self.server.pk).update(
+            cpu_usage=cpu_usage,
+            memory_usage=memory_usage,
+            task_count=task_count,
+            last_heartbeat=now,
+        )
+        renew_leases(self.server)
+        self.server.refresh_from_db(fields=['max_tasks', 'is_active', 'is_available'])
+        self.last_beat = now
+
+    def _heartbeat_loop(self, get_task_count):
+        while not self._stop.wait(settings.JUDGE_HEARTBEAT_INTERVAL):
+            close_old_connections()
+            try:
+                self.heartbeat(get_task_count())
+                reap_expired_leases()
+                advance_rejudge_jobs()
+            except Exception as e:
+                print(f"[JudgeNode] 心跳失败: {str(e)}")
+
+
+def record_judged(server):
+    """累计节点的判题数"""
+    JudgeServer.objects.filter(pk=server.pk).update(total_judged=F('total_judged') + 1)
+
+
+def _local_ip():
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError:
+        return '127.0.0.1'
+
+
+def _system_load():
+    """返回 (CPU使用率, 内存使用率)，单位为百分比"""
+    try:
+        cpu_usage = os.getloadavg()[0] / (os.cpu_count() or 1) * 100
+    except (AttributeError, OSError):
+        cpu_usage = 0.0
+
+    memory_usage = 0.0
+    try:
+        meminfo = {}
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0])
+        total = meminfo['MemTotal']
+        memory_usage = (total - meminfo['MemAvailable']) / total * 100
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        pass
+
+    return round(min(cpu_usage, 100.0), 1), round(memory_usage, 1)
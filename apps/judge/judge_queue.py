@@ -0,0 +1,182 @@
+"""
+判题队列
+以 submissions 表本身作为队列：状态为 pending 的提交即待判任务。
+判题进程用 SELECT ... FOR UPDATE SKIP LOCKED 领取任务，多台机器上的多个进程
+可以同时消费同一个队列而不会重复领取（需要PostgreSQL；SQLite只适合单进程开发）。
+
+调度规则：
+- 优先级高的提交先判（考试/比赛 > 班级作业 > 练习 > 重新判题）
+- 同一优先级内按用户轮转：先给每个用户各判一份最早的提交，再轮到各自的第二份
+- 每个用户同时在判的提交不超过 JUDGE_USER_INFLIGHT_LIMIT 个
+
+租约：领取时记录判题节点和租约到期时间，判题节点每次心跳续期。判题进程崩溃或节点离线后
+租约过期，提交被放回队列；领取次数达到 JUDGE_MAX_ATTEMPTS 的提交不再重试，标记为系统错误。
+领取次数同时作为令牌，租约被收回后原判题进程的结果不会写入。
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value, Window
+from django.db.models.functions import Coalesce, Least, RowNumber
+from django.utils import timezone
+
+from .models import Submission
+from .rejudge import advance_job, record_rejudged
+from .submission_stats import record_verdict
+from apps.problems.user_status import record_judge_result
+from apps.users.models import Class
+
+
+# 候选提交被其他判题进程抢先领取时的重试次数
+CLAIM_ATTEMPTS = 3
+
+
+def submission_priority(user):
+    """根据提交者的上下文确定判题优先级：在读班级的学生按作业处理，其余按练习处理"""
+    today = timezone.localdate()
+    in_class = Class.objects.filter(
+        students=user,
+        is_active=True,
+    ).filter(
+        Q(start_date__isnull=True) | Q(start_date__lte=today),
+        Q(end_date__isnull=True) | Q(end_date__gte=today),
+    ).exists()
+    return Submission.PRIORITY_HOMEWORK if in_class else Submission.PRIORITY_PRACTICE
+
+
+def _candidates(limit):
+    """按优先级和用户轮转顺序选出下一批候选提交ID（不加锁）"""
+    inflight = Submission.objects.filter(
+        user=OuterRef('user'),
+        status='judging',
+    ).values('user').annotate(count=Count('id')).values('count')
+
+    return list(
+        Submission.objects
+        .filter(status='pending')
+        .annotate(
+            # 该用户在同一优先级内的第几份待判提交，用于同一优先级内按用户轮转
+            user_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('user_id'), F('priority')],
+                order_by=[F('created_at').asc()],
+            ),
+            # 该用户所有优先级中的第几份待判提交，用于限制同时在判的数量
+            inflight_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('user_id')],
+                order_by=[F('priority').asc(), F('created_at').asc()],
+            ),
+            inflight=Coalesce(Subquery(inflight), Value(0)),
+        )
+        .filter(inflight_rank__lte=settings.JUDGE_USER_INFLIGHT_LIMIT - F('inflight'))
+        .order_by('priority', 'user_rank', 'created_at')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def claim_submissions(limit, server=None):
+    """领取最多limit个等待中的提交，标记为判题中并记录领取的判题节点和租约，返回提交ID列表"""
+    if limit <= 0:
+        return []
+
+    for _ in range(CLAIM_ATTEMPTS):
+        candidates = _candidates(limit)
+        if not candidates:
+            return []
+
+        with transaction.atomic():
+            # 候选可能已被其他进程领取，加锁时跳过被锁定的行并重新确认状态
+            ids = list(
+                Submission.objects
+                .select_for_update(skip_locked=True)
+                .filter(id__in=candidates, status='pending')
+                .values_list('id', flat=True)
+            )
+            if ids:
+                Submission.objects.filter(id__in=ids).update(
+                    status='judging',
+                    judge_server=server,
+                    lease_expires_at=lease_deadline(),
+                    judge_deadline=None,
+                    judge_attempts=F('judge_attempts') + 1,
+                )
+                return sorted(ids, key=candidates.index)
+    return []
+
+
+def lease_deadline():
+    """从现在开始计算的租约到期时间"""
+    return timezone.now() + timedelta(seconds=settings.JUDGE_LEASE_TIMEOUT)
+
+
+def renew_leases(server):
+    """
+    为判题节点正在判的提交续租，返回续租的数量
+
+    租约最多续到提交的判题截止时间：判题线程卡住时节点仍在心跳，
+    超过截止时间后租约不再延长，由清理流程收回
+    """
+    deadline = Value(lease_deadline())
+    return Submission.objects.filter(
+        status='judging',
+        judge_server=server,
+    ).update(lease_expires_at=Least(deadline, Coalesce(F('judge_deadline'), deadline)))
+
+
+def release_submissions(queryset, reason):
+    """
+    收回判题中断的提交：放回队列，领取次数已达上限的标记为系统错误
+
+    返回 (放回队列的数量, 标记为系统错误的数量)
+    """
+    queryset = queryset.filter(status='judging')
+    with transaction.atomic():
+        # 锁定后记下原结果，标记为系统错误后与判题进程写入系统错误时一样更新各项统计
+        poisoned_rows = list(queryset.filter(
+            judge_attempts__gte=settings.JUDGE_MAX_ATTEMPTS,
+        ).select_for_update().only(
+            'id', 'user_id', 'problem_id', 'language_id', 'created_at', 'result', 'rejudge_job_id',
+        ))
+        poisoned = Submission.objects.filter(
+            id__in=[submission.id for submission in poisoned_rows],
+        ).update(
+            status='error',
+            result='SE',
+            runtime_error=f'判题 {settings.JUDGE_MAX_ATTEMPTS} 次均未完成（{reason}）',
+            judge_server=None,
+            lease_expires_at=None,
+            judged_at=timezone.now(),
+        )
+        previous_results = {}
+        for submission in poisoned_rows:
+            previous_results[submission.id] = submission.result
+            submission.result = 'SE'
+            record_judge_result(submission, previous_results[submission.id])
+    for submission in poisoned_rows:
+        if submission.rejudge_job_id:
+            record_rejudged(submission, previous_results[submission.id])
+        record_verdict(submission, previous_results[submission.id])
+    for job_id in {submission.rejudge_job_id for submission in poisoned_rows if submission.rejudge_job_id}:
+        advance_job(job_id)
+    requeued = queryset.filter(
+        judge_attempts__lt=settings.JUDGE_MAX_ATTEMPTS,
+    ).update(
+        status='pending',
+        judge_server=None,
+        lease_expires_at=None,
+        judge_deadline=None,
+    )
+    if requeued or poisoned:
+        print(f"[JudgeQueue] {reason}: {requeued} 个提交放回队列，{poisoned} 个标记为系统错误")
+    return requeued, poisoned
+
+
+def reap_expired_leases():
+    """收回租约已过期的提交"""
+    return release_submissions(
+        Submission.objects.filter(lease_expires_at__lt=timezone.now()),
+        '判题租约过期',
+    )
@@ -4,15 +4,44 @@
 """
 
 import os
-import time
-import tempfile
-import subprocess
+import json
+import stat
+import secrets
+from datetime import timedelta
+
 import docker
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 from django.conf import settings
 
+from .counting import counted
 from .models import Submission, Language
-from apps.problems.models import TestCase
+from .rejudge import record_rejudged
+from .submission_stats import record_verdict
+from .sandbox import get_sandbox_backend, SandboxError, SANDBOX_USER
+from .cpu_budget import get_cpu_budget
+from .compile_cache import get_compile_cache
+from .verdict_cache import find_cached_verdict
+from .comparator import compare_output
+from .testdata_cache import get_testdata_cache
+from apps.problems.models import Problem, TestCase
+from apps.problems.user_status import record_judge_result
+
+
+# 判题机创建的目录：输入、运行器写入的输出、判题机与运行器通信的控制目录。
+# 工作目录对沙箱用户可写（带粘滞位），这些目录由判题机预先创建，沙箱用户无法写入或替换
+WORKSPACE_DIRS = ('in', 'out', 'ctl')
+
+# 判题机通知运行器停止的文件（位于控制目录内）
+STOP_FILE = 'ctl/stop'
+
+# 运行器进程本身占用的内存余量(MB)
+RUNNER_MEMORY_OVERHEAD = 64
+
+# 用例的墙上时间限制 = CPU时间限制 * 倍数 + 余量(ms)，与 runner.py 一致
+WALL_TIME_FACTOR = 2
+WALL_TIME_EXTRA = 500
 
 
 class JudgeResult:
@@ -27,6 +56,7 @@ class JudgeResult:
         self.compile_error = ''
         self.runtime_error = ''
         self.error_testcase = None
+        self.cached_from = None  # 复用结果的来源提交ID
 
 
 class Judger:
@@ -37,74 +67,43 @@ class Judger:
         self.language = self.submission.language
         self.problem = self.submission.problem
         self.result = JudgeResult()
-        self.docker_client = docker.from_env()
+        self.backend = get_sandbox_backend()
+        # 重新判题时提交保留着原结果，用于按结果变化更新统计
+        self.rejudge_job = self.submission.rejudge_job
+        self.previous_result = self.submission.result
         
     def judge(self):
         """执行判题"""
         print(f"[Judger] 开始判题: Submission #{self.submission.id}")
         
-        # 更新状态为判题中
+        # 更新状态为判题中，记录本次判题使用的测试数据版本和截止时间
         self.submission.status = 'judging'
-        self.submission.save()
+        self.submission.testdata_version = self.problem.testdata_version
+        self.submission.judge_deadline = timezone.now() + timedelta(seconds=self._time_budget())
+        if self.submission.lease_expires_at is None:
+            # 未经队列领取（直接调用）时没有节点心跳续租，租约直接持续到截止时间
+            self.submission.lease_expires_at = self.submission.judge_deadline
+            self.submission.judge_attempts += 1
+        else:
+            self.submission.lease_expires_at = min(self.submission.lease_expires_at, self.submission.judge_deadline)
+        self.submission.save(update_fields=[
+            'status', 'testdata_version', 'judge_deadline', 'lease_expires_at', 'judge_attempts'
+        ])
+        self.attempt = self.submission.judge_attempts
         
-        try:
-            # 1. 准备工作目录
-            workspace = self._prepare_workspace()
-            
-            # 2. 编译代码（如果需要）
-            if self.language.compile_command:
-                compile_result = self._compile_code(workspace)
-                if not compile_result['success']:
-                    self._finish_with_ce(compile_result['error'])
-                    return self.result
-            
-            # 3. 获取测试用例
-            test_cases = self.problem.test_cases.all().order_by('order')
-            if not test_cases.exists():
-                self._finish_with_error('没有测试用例')
+        # 相同代码在相同测试数据上的结果是确定的，直接复用
+        if settings.JUDGE_VERDICT_CACHE:
+            # 重新判题只复用本次任务开始后得到的结果
+            judged_after = self.rejudge_job.created_at if self.rejudge_job else None
+            cached = find_cached_verdict(self.submission, self.submission.testdata_version, judged_after)
+            if cached is not None:
+                self._finish_with_cached(cached)
                 return self.result
-            
-            # 4. 运行所有测试用例
-            all_passed = True
-            total_time = 0
-            max_memory = 0
-            
-            for idx, testcase in enumerate(test_cases, 1):
-                print(f"[Judger] 运行测试用例 {idx}/{len(test_cases)}")
-                
-                test_result = self._run_testcase(workspace, testcase)
-                self.result.test_results.append(test_result)
-                
-                # 累计时间和内存
-                total_time += test_result.get('time', 0)
-                max_memory = max(max_memory, test_result.get('memory', 0))
-                
-                # 如果不是AC，记录并停止
-                if test_result['result'] != 'AC':
-                    all_passed = False
-                    self.result.error_testcase = idx
-                    self.result.status = test_result['result']
-                    if 'error' in test_result:
-                        self.result.runtime_error = test_result['error']
-                    break
-            
-            # 5. 汇总结果
-            if all_passed:
-                self.result.status = 'AC'
-            
-            self.result.time_used = total_time
-            self.result.memory_used = max_memory
-            
-            # 计算得分
-            passed_count = len([r for r in self.result.test_results if r['result'] == 'AC'])
-            total_count = len(test_cases)
-            self.result.score = int((passed_count / total_count) * self.submission.total_score)
-            
-            # 6. 更新提交记录
-            self._update_submission()
-            
-            # 7. 清理工作目录
-            self._cleanup_workspace(workspace)
+        
+        try:
+            # 借出沙箱，编译和所有测试用例都在同一个沙箱内执行
+            with self.backend.sandbox(self.language) as sandbox:
+                self._judge_in_sandbox(sandbox)
             
             print(f"[Judger] 判题完成: {self.result.status}")
             
@@ -114,9 +113,79 @@ class Judger:
         
         return self.result
     
-    def _prepare_workspace(self):
-        """准备工作目录"""
-        workspace = tempfile.mkdtemp(prefix='judge_')
+    def _time_budget(self):
+        """本次判题最长允许的时间(秒)：编译超时 + 所有用例的墙上时间限制 + 固定余量"""
+        wall_ms = sum(
+            (time_limit if time_limit is not None else self.problem.time_limit) * WALL_TIME_FACTOR + WALL_TIME_EXTRA
+            for time_limit in self.problem.test_cases.values_list('time_limit', flat=True)
+        )
+        compile_timeout = self.language.compile_timeout + 1 if self.language.compile_command else 0
+        return compile_timeout + wall_ms / 1000 + settings.JUDGE_DEADLINE_EXTRA
+    
+    def _judge_in_sandbox(self, sandbox):
+        """在沙箱内完成编译和测试"""
+        # 1. 准备工作目录
+        workspace = self._prepare_workspace(sandbox)
+        
+        # 2. 编译代码（如果需要）
+        if self.language.compile_command:
+            compile_result = self._compile_code(sandbox)
+            if not compile_result['success']:
+                self._finish_with_ce(compile_result['error'], compile_result.get('transient', False))
+                return
+        
+        # 3. 获取测试用例
+        test_cases = self.problem.test_cases.all().order_by('order')
+        if not test_cases.exists():
+            self._finish_with_error('没有测试用例')
+            return
+        
+        # 4. 运行所有测试用例（一次调用沙箱内的运行器）
+        all_passed = True
+        total_time = 0
+        max_memory = 0
+        
+        for idx, test_result in enumerate(self._run_testcases(sandbox, workspace, test_cases), 1):
+            self.result.test_results.append(test_result)
+            
+            # 累计时间和内存
+            total_time += test_result.get('time', 0)
+            max_memory = max(max_memory, test_result.get('memory', 0))
+            
+            # 如果不是AC，记录并停止
+            if test_result['result'] != 'AC':
+                all_passed = False
+                self.result.error_testcase = idx
+                self.result.status = test_result['result']
+                if 'error' in test_result:
+                    self.result.runtime_error = test_result['error']
+                break
+        
+        # 5. 汇总结果
+        if all_passed:
+            self.result.status = 'AC'
+        
+        self.result.time_used = total_time
+        self.result.memory_used = max_memory
+        
+        # 计算得分
+        passed_count = len([r for r in self.result.test_results if r['result'] == 'AC'])
+        total_count = len(test_cases)
+        self.result.score = int((passed_count / total_count) * self.submission.total_score)
+        
+        # 6. 更新提交记录（工作目录在容器归还时清空）
+        self._update_submission()
+    
+    def _prepare_workspace(self, sandbox):
+        """准备工作目录（使用沙箱的工作目录）"""
+        workspace = sandbox.workspace
+        
+        # 在沙箱内执行任何命令之前创建，目录已存在说明工作目录没有清空
+        for name in WORKSPACE_DIRS:
+            try:
+                os.mkdir(os.path.join(workspace, name), 0o755)
+            except OSError as e:
+                raise SandboxError(f'创建工作目录失败: {e}')
         
         # 写入源代码
         src_file = os.path.join(workspace, f'main{self.language.file_extension}')
@@ -126,167 +195,267 @@ class Judger:
         print(f"[Judger] 工作目录: {workspace}")
         return workspace
     
-    def _compile_code(self, workspace):
-        """编译代码"""
-        print(f"[Judger] 开始编译...")
+    def _format_command(self, command, sandbox):
+        """填充命令中的源文件和可执行文件路径（沙箱内路径）"""
+        return command.format(
+            src=f'{sandbox.root}/main{self.language.file_extension}',
+            exe=f'{sandbox.root}/main'
+        )
+    
+    def _compile_code(self, sandbox):
+        """编译代码（命中编译缓存时跳过编译）"""
+        cache = get_compile_cache()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(
+                self.submission.code,
+                self.language.compile_command,
+                sandbox.image_id
+            )
+            cached = cache.load(cache_key, sandbox.workspace)
+            if cached is not None:
+                print(f"[Judger] 命中编译缓存")
+                return cached
         
-        src_file = os.path.join(workspace, f'main{self.language.file_extension}')
-        exe_file = os.path.join(workspace, 'main')
+        print(f"[Judger] 开始编译...")
         
-        # 构建编译命令
-        compile_cmd = self.language.compile_command.format(
-            src=src_file,
-            exe=exe_file
-        )
+        compile_cmd = self._format_command(self.language.compile_command, sandbox)
         
         try:
-            # 使用Docker编译
-            container = self.docker_client.containers.run(
-                image=self.language.docker_image,
-                command=f'bash -c "{compile_cmd}"',
-                volumes={workspace: {'bind': '/workspace', 'mode': 'rw'}},
-                working_dir='/workspace',
-                detach=True,
-                remove=False,
-                mem_limit='512m',
-                network_mode='none',
-                user='root'  # 编译需要写文件
+            # 在沙箱内编译
+            sandbox.set_memory_limit(512)
+            # 超时先发SIGTERM，1秒后仍未退出再SIGKILL；超时时退出码为124（发出SIGKILL时为137）
+            exit_code, logs = sandbox.exec(
+                f'timeout -k 1s {self.language.compile_timeout}s {compile_cmd}',
+                user=SANDBOX_USER,
             )
             
-            # 等待编译完成
-            result = container.wait(timeout=self.language.compile_timeout)
-            logs = container.logs().decode('utf-8', errors='ignore')
-            
-            container.remove(force=True)
+            # 超时或被信号终止（超出内存被杀等）可能是机器繁忙导致，都不写入缓存，
+            # 也不作为判题结果缓存复用
+            if exit_code == 124:
+                return {'success': False, 'error': '编译超时', 'transient': True}
+            if exit_code > 128:
+                return {
+                    'success': False,
+                    'error': f'编译进程被终止（超时或超出内存限制）\n{logs}'.strip(),
+                    'transient': True,
+                }
             
-            if result['StatusCode'] == 0:
+            if exit_code == 0:
                 print(f"[Judger] 编译成功")
-                return {'success': True}
+                result = {'success': True}
             else:
                 print(f"[Judger] 编译失败: {logs}")
-                return {'success': False, 'error': logs}
+                result = {'success': False, 'error': logs}
+            
+            if cache_key:
+                cache.store(cache_key, result, sandbox.workspace)
+            return result
         
-        except docker.errors.ContainerError as e:
-            return {'success': False, 'error': str(e)}
+        except (docker.errors.APIError, SandboxError):
+            raise
         except Exception as e:
             return {'success': False, 'error': f'编译异常: {str(e)}'}
     
-    def _run_testcase(self, workspace, testcase):
-        """运行单个测试用例"""
+    def _run_testcases(self, sandbox, workspace, test_cases):
+        """通过沙箱内的运行器一次运行所有测试用例，返回到第一个错误为止的结果"""
         
-        # 获取时间和内存限制
-        time_limit = testcase.get_time_limit()  # ms
-        memory_limit = testcase.get_memory_limit()  # MB
-        
-        # 准备输入输出文件
-        input_file = os.path.join(workspace, 'input.txt')
-        output_file = os.path.join(workspace, 'output.txt')
-        
-        with open(input_file, 'w', encoding='utf-8') as f:
-            f.write(testcase.input_data)
-        
-        # 构建运行命令
-        if self.language.name == 'python':
-            src_file = os.path.join(workspace, f'main{self.language.file_extension}')
-            run_cmd = f'python3 {src_file} < input.txt > output.txt 2>&1'
-        elif self.language.name == 'cpp':
-            exe_file = os.path.join(workspace, 'main')
-            run_cmd = f'{exe_file} < input.txt > output.txt 2>&1'
-        else:
-            return {'result': 'SE', 'error': '不支持的语言'}
+        # 按哈希清单把缺少的测试数据拉取到本节点的缓存
+        cache = get_testdata_cache()
+        if cache is not None:
+            cache.sync(test_cases)
         
-        try:
-            # 使用Docker运行
-            start_time = time.time()
-            
-            container = self.docker_client.containers.run(
-                image=self.language.docker_image,
-                command=f'bash -c "timeout {time_limit/1000}s {run_cmd}"',
-                volumes={workspace: {'bind': '/workspace', 'mode': 'rw'}},
-                working_dir='/workspace',
-                detach=True,
-                remove=False,
-                mem_limit=f'{memory_limit}m',
-                memswap_limit=f'{memory_limit}m',
-                network_mode='none',
-                pids_limit=50,
-                user='root'
-            )
+        # 准备输入文件和判题清单
+        cases = {}
+        manifest_cases = []
+        for idx, testcase in enumerate(test_cases, 1):
+            input_path = f'in/{idx}.in'
+            self._copy_input(testcase, os.path.join(workspace, input_path))
             
-            # 等待运行完成（超时时间+1秒缓冲）
-            try:
-                result = container.wait(timeout=(time_limit / 1000) + 1)
-                actual_time = int((time.time() - start_time) * 1000)
-            except:
-                # 超时
-                container.kill()
-                container.remove(force=True)
-                return {'result': 'TLE', 'time': time_limit}
+            cases[idx] = testcase
+            manifest_cases.append({
+                'id': idx,
+                'input': input_path,
+                'output': f'out/{idx}.out',
+                'time_limit': testcase.get_time_limit(),  # ms
+                'memory_limit': testcase.get_memory_limit(),  # MB
+                'output_limit': self.problem.output_limit * 1024,  # 字节
+            })
+        
+        # 并行模式下同时运行多个用例，每个用例独占一个CPU
+        parallel = settings.JUDGE_PARALLEL_CASES if settings.JUDGE_PARALLEL else 1
+        parallel = max(1, min(parallel, len(manifest_cases)))
+        
+        with get_cpu_budget().reserve(parallel) as cpus:
+            manifest = {
+                'nonce': secrets.token_hex(16),
+                'command': self._format_command(self.language.run_command, sandbox),
+                'cases': manifest_cases,
+                'stop_on_failure': True,
+                'stop_file': STOP_FILE,
+                'parallel': parallel,
+                'cpus': cpus,
+            }
             
-            # 获取退出码
-            exit_code = result['StatusCode']
+            # 沙箱内存限制按同时运行的用例数累加，外加运行器自身的开销
+            slots = min(parallel, len(cpus)) if cpus else parallel
+            max_memory_limit = max(case['memory_limit'] for case in manifest_cases)
+            sandbox.set_memory_limit(max_memory_limit * slots + RUNNER_MEMORY_OVERHEAD)
             
-            container.remove(force=True)
+            checked, runner_output = self._collect_records(sandbox, workspace, cases, manifest)
+        
+        # 按编号整理结果，截止到第一个错误；中间缺失的用例说明运行器异常
+        results = []
+        for idx in sorted(cases):
+            if idx not in checked:
+                error = '\n'.join(runner_output)[-1000:]
+                results.append({'result': 'SE', 'error': f'运行器异常: {error}'})
+                break
+            results.append(checked[idx])
+            if checked[idx]['result'] != 'AC':
+                break
+        
+        return results
+    
+    def _collect_records(self, sandbox, workspace, cases, manifest):
+        """执行运行器，读取流式结果并逐个比对，返回 ({用例编号: 结果}, 运行器的其他输出)"""
+        checked = {}
+        runner_output = []
+        failed_id = None
+        
+        for line in sandbox.run_runner(manifest):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                runner_output.append(line)
+                continue
             
-            # 检查运行时错误
-            if exit_code == 124:  # timeout命令的超时退出码
-                return {'result': 'TLE', 'time': time_limit}
-            elif exit_code != 0:
-                # 读取错误输出
-                if os.path.exists(output_file):
-                    with open(output_file, 'r', encoding='utf-8', errors='ignore') as f:
-                        error_output = f.read()[:1000]  # 限制长度
-                else:
-                    error_output = f'Exit code: {exit_code}'
-                return {'result': 'RE', 'time': actual_time, 'error': error_output}
+            # 只接受带本次nonce的结果行，每个用例只取第一条，用户程序伪造的结果行被忽略
+            if not isinstance(record, dict) or record.get('nonce') != manifest['nonce']:
+                runner_output.append(line)
+                continue
+            idx = record.get('id')
+            if idx not in cases or idx in checked:
+                continue
             
-            # 读取输出
-            if not os.path.exists(output_file):
-                return {'result': 'RE', 'time': actual_time, 'error': '没有输出文件'}
+            # 编号大于已知错误用例的结果不再需要
+            if failed_id is not None and idx > failed_id:
+                continue
             
-            with open(output_file, 'r', encoding='utf-8', errors='ignore') as f:
-                user_output = f.read()
+            print(f"[Judger] 测试用例 {idx}/{len(cases)}: {record['status']}")
             
-            # 检查输出大小限制（64KB）
-            if len(user_output.encode('utf-8')) > 64 * 1024:
-                return {'result': 'OLE', 'time': actual_time}
+            test_result = self._check_record(workspace, cases[idx], record)
+            checked[idx] = test_result
             
-            # 比对输出
-            if self._compare_output(user_output, testcase.output_data):
-                return {
-                    'result': 'AC',
-                    'time': actual_time,
-                    'memory': 0  # TODO: 获取实际内存使用
-                }
-            else:
-                return {
-                    'result': 'WA',
-                    'time': actual_time,
-                    'memory': 0,
-                    'user_output': user_output[:500],  # 限制长度
-                    'expected_output': testcase.output_data[:500]
-                }
+            # 比对失败时把出错编号写入停止文件，运行器取消编号更大的用例
+            if test_result['result'] != 'AC':
+                self._write_stop_file(workspace, idx, first=failed_id is None)
+                failed_id = idx
         
-        except docker.errors.APIError as e:
-            return {'result': 'SE', 'error': f'Docker API错误: {str(e)}'}
-        except Exception as e:
-            return {'result': 'SE', 'error': f'运行异常: {str(e)}'}
+        return checked, runner_output
+    
+    def _write_stop_file(self, workspace, idx, first):
+        """写入停止文件：先写新建的临时文件再改名，不跟随符号链接，运行器不会读到写了一半的文件"""
+        path = os.path.join(workspace, STOP_FILE)
+        # 第一次写入前停止文件就已存在，说明控制目录被沙箱内的程序改动过
+        if first and os.path.lexists(path):
+            raise SandboxError('停止文件已存在')
+        tmp_path = f'{path}.{idx}'
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o644)
+        except OSError as e:
+            raise SandboxError(f'写入停止文件失败: {e}')
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(idx))
+        os.replace(tmp_path, path)
+    
+    def _copy_input(self, testcase, dest):
+        """复制测试用例输入，优先使用本节点的缓存"""
+        cache = get_testdata_cache()
+        if cache is not None and testcase.input_hash:
+            cache.copy_to(testcase.input_hash, dest)
+        else:
+            testcase.copy_data_to('input', dest)
+    
+    def _open_expected(self, testcase):
+        """打开测试用例的标准输出，优先使用本节点的缓存"""
+        cache = get_testdata_cache()
+        if cache is not None and testcase.output_hash:
+            return cache.open(testcase.output_hash)
+        return testcase.open_data('output')
     
-    def _compare_output(self, user_output, expected_output):
-        """比对输出（忽略行尾空格和空行）"""
+    def _read_expected(self, testcase, limit):
+        with self._open_expected(testcase) as f:
+            return f.read(limit)
+    
+    def _check_record(self, workspace, testcase, record):
+        """根据运行器返回的结果判定单个测试用例"""
+        
+        time_limit = testcase.get_time_limit()  # ms
+        actual_time = record['cpu_time']
+        memory = record['memory']
         
-        def normalize(text):
-            lines = text.strip().split('\n')
-            # 去除每行末尾空格
-            lines = [line.rstrip() for line in lines]
-            # 去除空行
-            lines = [line for line in lines if line]
-            return '\n'.join(lines)
+        if record['status'] == 'TLE':
+            return {'result': 'TLE', 'time': time_limit, 'memory': memory}
+        elif record['status'] == 'MLE':
+            return {'result': 'MLE', 'time': actual_time, 'memory': memory}
+        elif record['status'] == 'OLE':
+            return {'result': 'OLE', 'time': actual_time, 'memory': memory}
+        elif record['status'] == 'RE':
+            # 标准错误由运行器单独截取（已截断）
+            error_output = record.get('stderr', '')
+            if not error_output:
+                if record['signal']:
+                    error_output = f"Signal: {record['signal']}"
+                else:
+                    error_output = f"Exit code: {record['exit_code']}"
+            return {'result': 'RE', 'time': actual_time, 'memory': memory, 'error': error_output}
+        
+        # 读取输出
+        output = self._open_output(workspace, record['id'])
+        if output is None:
+            return {'result': 'RE', 'time': actual_time, 'error': '没有输出文件'}
         
-        user_norm = normalize(user_output)
-        expected_norm = normalize(expected_output)
+        # 流式比对输出，用户输出和标准输出都不整个读入内存
+        with output as f:
+            with self._open_expected(testcase) as expected:
+                mismatch = compare_output(f, expected)
+            if mismatch is not None:
+                f.seek(0)
+                user_output = f.read(500).decode('utf-8', errors='ignore')  # 限制长度
         
-        return user_norm == expected_norm
+        if mismatch is None:
+            return {
+                'result': 'AC',
+                'time': actual_time,
+                'memory': memory
+            }
+        else:
+            return {
+                'result': 'WA',
+                'time': actual_time,
+                'memory': memory,
+                'user_output': user_output,
+                'expected_output': self._read_expected(testcase, 500).decode('utf-8', errors='ignore'),
+                'mismatch': mismatch  # 第一处差异的行列位置
+            }
+    
+    def _open_output(self, workspace, idx):
+        """
+        打开运行器写入的输出文件，不存在返回None
+
+        不跟随符号链接并确认是普通文件，沙箱内的程序无法让判题机读取宿主机上的其他文件
+        """
+        try:
+            fd = os.open(os.path.join(workspace, 'out', f'{idx}.out'), os.O_RDONLY | os.O_NOFOLLOW)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            raise SandboxError(f'无法打开输出文件: {e}')
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            os.close(fd)
+            raise SandboxError('输出文件不是普通文件')
+        return os.fdopen(fd, 'rb')
     
     def _update_submission(self):
         """更新提交记录"""
@@ -296,48 +465,104 @@ class Judger:
         self.submission.time_used = self.result.time_used
         self.submission.memory_used = self.result.memory_used
         self.submission.test_cases_passed = len([r for r in self.result.test_results if r['result'] == 'AC'])
+        self.submission.compile_error = ''
         self.submission.runtime_error = self.result.runtime_error
         self.submission.error_testcase = self.result.error_testcase
         self.submission.judge_detail = {
             'test_cases': self.result.test_results,
             'judged_at': timezone.now().isoformat()
         }
+        if self.result.cached_from:
+            self.submission.judge_detail['cached_from'] = self.result.cached_from
         self.submission.judged_at = timezone.now()
         
         # 计算通过率
         if self.submission.test_cases_total > 0:
             self.submission.pass_rate = (self.submission.test_cases_passed / self.submission.test_cases_total) * 100
         
-        self.submission.save()
+        if not self._save_submission():
+            return
         
-        # 更新题目统计
-        self._update_problem_stats()
-        
-        # 更新用户统计
-        self._update_user_stats()
+        # 更新题目统计和提交统计汇总（用户统计已在保存判题结果时更新）
+        if self.rejudge_job:
+            record_rejudged(self.submission, self.previous_result)
+        else:
+            self._update_problem_stats()
+        record_verdict(self.submission, self.previous_result)
+    
+    def _save_submission(self):
+        """
+        保存判题结果并释放租约，同一事务中更新用户题目状态
+
+        租约过期后提交可能已被放回队列或由其他判题进程重新领取（领取次数变化），
+        此时放弃本次结果，返回False
+        """
+        with transaction.atomic():
+            holds_lease = Submission.objects.select_for_update().filter(
+                id=self.submission.id,
+                status='judging',
+                judge_attempts=self.attempt,
+            ).exists()
+            if not holds_lease:
+                print(f"[Judger] 租约已被收回，放弃 Submission #{self.submission.id} 的本次结果")
+                return False
+            self.submission.lease_expires_at = None
+            self.submission.save()
+            record_judge_result(self.submission, self.previous_result)
+        return True
     
     def _update_problem_stats(self):
-        """更新题目统计"""
-        self.problem.total_submit += 1
-        if self.result.status == 'AC':
-            self.problem.total_accepted += 1
-        self.problem.save()
+        """
+        更新题目统计
+
+        用单条UPDATE在数据库中自增，不读回再整行保存：并发判题不会丢失计数，
+        且在判题结果事务之外执行，热门题目的行锁只在这一条语句内持有；
+        与重新判题相同，系统错误等不计入提交数的结果不更新
+        """
+        if not counted(self.submission.result):
+            return
+        Problem.objects.filter(id=self.problem.id).update(
+            total_submit=F('total_submit') + 1,
+            total_accepted=F('total_accepted') + (1 if self.submission.result == 'AC' else 0),
+        )
     
-    def _update_user_stats(self):
-        """更新用户统计"""
-        if hasattr(self.submission.user, 'profile'):
-            profile = self.submission.user.profile
-            profile.update_stats()
+    def _finish_with_cached(self, cached):
+        """复用历史提交的判题结果"""
+        print(f"[Judger] 复用提交 #{cached.id} 的判题结果")
+        
+        self.result.cached_from = cached.id
+        if cached.result == 'CE':
+            self._finish_with_ce(cached.compile_error)
+            return
+        
+        self.result.status = cached.result
+        self.result.time_used = cached.time_used or 0
+        self.result.memory_used = cached.memory_used or 0
+        self.result.score = cached.score
+        self.result.test_results = (cached.judge_detail or {}).get('test_cases', [])
+        self.result.runtime_error = cached.runtime_error
+        self.result.error_testcase = cached.error_testcase
+        
+        self._update_submission()
     
-    def _finish_with_ce(self, error_message):
-        """编译错误结束"""
+    def _finish_with_ce(self, error_message, transient=False):
+        """编译错误结束，transient 表示编译超时或被终止，结果不可复用"""
         self.submission.status = 'finished'
         self.submission.result = 'CE'
         self.submission.compile_error = error_message[:5000]  # 限制长度
         self.submission.score = 0
         self.submission.test_cases_passed = 0
         self.submission.judged_at = timezone.now()
-        self.submission.save()
+        self.submission.judge_detail = {
+            'test_cases': [],
+            'judged_at': self.submission.judged_at.isoformat(),
+        }
+        if transient:
+            self.submission.judge_detail['transient'] = True
+        if self._save_submission():
+            if self.rejudge_job:
+                record_rejudged(self.submission, self.previous_result)
+            record_verdict(self.submission, self.previous_result)
         
         self.result.status = 'CE'
         self.result.compile_error = error_message
@@ -345,20 +570,15 @@ class Judger:
     def _finish_with_error(self, error_message):
         """系统错误结束"""
         self.submission.status = 'error'
+        self.submission.result = 'SE'
         self.submission.runtime_error = error_message[:5000]
-        self.submission.save()
+        if self._save_submission():
+            if self.rejudge_job:
+                record_rejudged(self.submission, self.previous_result)
+            record_verdict(self.submission, self.previous_result)
         
         self.result.status = 'SE'
         self.result.runtime_error = error_message
-    
-    def _cleanup_workspace(self, workspace):
-        """清理工作目录"""
-        import shutil
-        try:
-            shutil.rmtree(workspace)
-            print(f"[Judger] 清理工作目录: {workspace}")
-        except Exception as e:
-            print(f"[Judger] 清理失败: {str(e)}")
 
 
 def judge_submission(submission_id):
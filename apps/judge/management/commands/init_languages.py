@@ -29,7 +29,7 @@ def main():
 if __name__ == '__main__':
     main()
 ''',
-                'docker_image': 'python:3.10-slim',
+                'docker_image': 'oj-judge-python:latest',
                 'file_extension': '.py',
                 'is_active': True,
                 'order': 1
@@ -65,7 +65,7 @@ int main() {
     return 0;
 }
 ''',
-                'docker_image': 'gcc:11-slim',
+                'docker_image': 'oj-judge-cpp:latest',
                 'file_extension': '.cpp',
                 'is_active': True,
                 'order': 2
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.judge.reaper import reap
+
+
+class Command(BaseCommand):
+    help = '清理判题：收回租约过期的提交，删除判题进程遗留的目录、容器和cgroup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='每隔多少秒清理一次，0表示只清理一次后退出'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            close_old_connections()
+            stats = reap()
+            self.stdout.write(
+                f"收回提交: 放回队列 {stats['requeued']}，系统错误 {stats['poisoned']}；"
+                f"清理工作目录 {stats['workspaces']}，临时目录 {stats['temp_dirs']}，"
+                f"容器 {stats['containers']}，cgroup {stats['cgroups']}"
+            )
+            if interval <= 0:
+                break
+            time.sleep(interval)
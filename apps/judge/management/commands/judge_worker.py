@@ -0,0 +1,98 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.judge.judge_node import JudgeNode, record_judged
+from apps.judge.judge_queue import claim_submissions, reap_expired_leases
+from apps.judge.judger import judge_submission
+from apps.judge.models import Language
+from apps.judge.rejudge import advance_rejudge_jobs
+from apps.judge.sandbox import get_sandbox_backend
+from apps.judge.workspace_pool import get_workspace_pool
+
+
+class Command(BaseCommand):
+    help = '判题进程：从数据库队列领取等待中的提交并判题'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JUDGE_WORKER_CONCURRENCY,
+            help='同时判题的提交数'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.JUDGE_WORKER_POLL_INTERVAL,
+            help='队列为空时的轮询间隔(秒)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='队列清空后退出（用于脚本和调试）'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        self.stopping = False
+
+        # 收到停止信号后不再领取新任务，等正在判的提交完成再退出
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        # 工作目录池所在文件系统超过大小上限时拒绝启动
+        get_workspace_pool().setup()
+
+        # 登记为判题节点并定期上报心跳、续租，租约过期的提交由其他节点收回
+        self.node = JudgeNode(max_tasks=concurrency)
+        self.node.register()
+        reap_expired_leases()
+
+        # 为启用的语言预先启动沙箱
+        if settings.JUDGE_POOL_PREWARM > 0:
+            get_sandbox_backend().prewarm(Language.objects.filter(is_active=True))
+
+        self.stdout.write(f'判题进程启动，节点: {self.node.hostname}，并发数: {concurrency}')
+        running = set()
+        self.node.start(lambda: sum(1 for future in list(running) if not future.done()))
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='judge') as executor:
+            while not self.stopping:
+                running = {future for future in running if not future.done()}
+
+                claimed = claim_submissions(self.node.capacity(len(running)), self.node.server)
+                for submission_id in claimed:
+                    running.add(executor.submit(self._judge, submission_id))
+
+                if claimed:
+                    continue
+                if not running and advance_rejudge_jobs():
+                    # 队列已空时立即放入重新判题任务的下一批
+                    continue
+                if options['once'] and not running:
+                    break
+                if running:
+                    # 有任务完成时立即领取下一个
+                    wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(poll_interval)
+
+            if running:
+                self.stdout.write(f'等待 {len(running)} 个判题任务完成...')
+
+        self.node.stop()
+        self.stdout.write('判题进程已退出')
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _judge(self, submission_id):
+        """在线程中判题，每个任务前后清理失效的数据库连接"""
+        close_old_connections()
+        try:
+            judge_submission(submission_id)
+            record_judged(self.node.server)
+        except Exception as e:
+            print(f"[Judge Error] Submission #{submission_id}: {str(e)}")
+        finally:
+            close_old_connections()
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.judge.testdata_cache import get_testdata_cache
+from apps.problems.models import Problem
+
+
+class Command(BaseCommand):
+    help = '预先把题目的测试数据拉取到本判题节点的缓存（比赛、考试开始前在每个判题节点执行）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'problem_ids', nargs='*', type=int,
+            help='题目ID'
+        )
+        parser.add_argument(
+            '--recent', type=int, default=0,
+            help='同时预热最近多少小时内有提交的题目'
+        )
+        parser.add_argument(
+            '--published', action='store_true',
+            help='预热所有已发布的题目'
+        )
+
+    def handle(self, *args, **options):
+        cache = get_testdata_cache()
+        if cache is None:
+            raise CommandError('未启用测试数据缓存（JUDGE_TESTDATA_CACHE）')
+
+        problems = Problem.objects.none()
+        if options['problem_ids']:
+            problems |= Problem.objects.filter(id__in=options['problem_ids'])
+        if options['recent']:
+            since = timezone.now() - timedelta(hours=options['recent'])
+            problems |= Problem.objects.filter(submissions__created_at__gte=since)
+        if options['published']:
+            problems |= Problem.objects.filter(status='published')
+        problems = problems.distinct().order_by('id')
+        if not problems.exists():
+            raise CommandError('请指定题目ID、--recent 或 --published')
+
+        total = 0
+        for problem in problems.only('id', 'title'):
+            fetched = cache.sync(problem.test_cases.all())
+            total += fetched
+            self.stdout.write(f'{problem.id} {problem.title}: 拉取 {fetched} 个文件')
+
+        self.stdout.write(self.style.SUCCESS(f'预热完成，共拉取 {total} 个文件'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.judge.submission_stats import rebuild
+
+
+class Command(BaseCommand):
+    help = '从提交记录重建提交统计汇总（SubmissionStat）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='只重建该日期（YYYY-MM-DD）及以后的汇总，默认全部重建'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='每批写入的汇总行数'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError(f"日期格式错误: {options['since']}")
+
+        written = rebuild(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'重建完成: {written} 条汇总'))
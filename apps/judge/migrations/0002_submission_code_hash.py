@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='code_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='代码哈希'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='testdata_version',
+            field=models.IntegerField(blank=True, null=True, verbose_name='测试数据版本'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['problem', 'language', 'code_hash'], name='submissions_problem_4e2051_idx'),
+        ),
+    ]
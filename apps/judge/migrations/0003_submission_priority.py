@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0002_submission_code_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='priority',
+            field=models.SmallIntegerField(choices=[(0, '考试/比赛'), (1, '班级作业'), (2, '练习'), (3, '重新判题')], default=2, verbose_name='判题优先级'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='submissions_status_974e0f_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0003_submission_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='judge_server',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to='judge.judgeserver', verbose_name='判题节点'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0004_submission_judge_server'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='judge_attempts',
+            field=models.SmallIntegerField(default=0, verbose_name='判题次数'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='判题租约到期时间'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='submissions_status_231e16_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('problems', '__first__'),
+        ('judge', '0005_submission_lease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RejudgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('results', models.CharField(blank=True, max_length=100, verbose_name='结果筛选')),
+                ('submitted_after', models.DateTimeField(blank=True, null=True, verbose_name='提交时间起')),
+                ('submitted_before', models.DateTimeField(blank=True, null=True, verbose_name='提交时间止')),
+                ('status', models.CharField(choices=[('running', '进行中'), ('finished', '已完成'), ('cancelled', '已取消')], default='running', max_length=20, verbose_name='状态')),
+                ('total', models.IntegerField(default=0, verbose_name='提交总数')),
+                ('enqueued', models.IntegerField(default=0, verbose_name='已入队')),
+                ('judged', models.IntegerField(default=0, verbose_name='已判完')),
+                ('changed', models.IntegerField(default=0, verbose_name='结果变化数')),
+                ('last_submission_id', models.IntegerField(default=0, verbose_name='已入队的最大提交ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rejudge_jobs', to=settings.AUTH_USER_MODEL, verbose_name='创建者')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rejudge_jobs', to='problems.problem', verbose_name='题目')),
+            ],
+            options={
+                'verbose_name': '重新判题任务',
+                'verbose_name_plural': '重新判题任务',
+                'db_table': 'rejudge_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='rejudge_job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to='judge.rejudgejob', verbose_name='重新判题任务'),
+        ),
+    ]
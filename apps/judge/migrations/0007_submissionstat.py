@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '__first__'),
+        ('judge', '0006_rejudgejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('class_scope', models.IntegerField(default=0, help_text='0表示全站，否则为提交者所在班级', verbose_name='班级ID')),
+                ('result', models.CharField(choices=[('AC', 'Accepted'), ('WA', 'Wrong Answer'), ('TLE', 'Time Limit Exceeded'), ('MLE', 'Memory Limit Exceeded'), ('RE', 'Runtime Error'), ('CE', 'Compile Error'), ('SE', 'System Error'), ('PE', 'Presentation Error'), ('OLE', 'Output Limit Exceeded')], max_length=10, verbose_name='判题结果')),
+                ('count', models.IntegerField(default=0, verbose_name='提交数')),
+                ('language', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_stats', to='judge.language', verbose_name='编程语言')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submission_stats', to='problems.problem', verbose_name='题目')),
+            ],
+            options={
+                'verbose_name': '提交统计',
+                'verbose_name_plural': '提交统计',
+                'db_table': 'submission_stats',
+                'indexes': [models.Index(fields=['class_scope', 'problem', 'day'], name='submission__class_s_07b2a4_idx')],
+                'unique_together': {('class_scope', 'day', 'problem', 'language', 'result')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0007_submissionstat'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['created_at', 'id'], name='submissions_created_99bc46_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0008_submission_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='judge_deadline',
+            field=models.DateTimeField(blank=True, help_text='本次判题最长允许到的时间，租约不会续到此时间之后', null=True, verbose_name='判题截止时间'),
+        ),
+    ]
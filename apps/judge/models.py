@@ -1,4 +1,5 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from apps.problems.models import Problem
@@ -66,6 +67,21 @@ class Submission(models.Model):
         ('OLE', 'Output Limit Exceeded'),    # 输出超限
     ]
     
+    # 判题优先级（数值越小越优先）
+    PRIORITY_CONTEST = 0     # 考试/比赛
+    PRIORITY_HOMEWORK = 1    # 班级作业
+    PRIORITY_PRACTICE = 2    # 日常练习
+    PRIORITY_REJUDGE = 3     # 重新判题
+    PRIORITY_CHOICES = [
+        (PRIORITY_CONTEST, '考试/比赛'),
+        (PRIORITY_HOMEWORK, '班级作业'),
+        (PRIORITY_PRACTICE, '练习'),
+        (PRIORITY_REJUDGE, '重新判题'),
+    ]
+    
+    # 体积较大的列，列表查询不加载（defer），详情和查看代码时再读取
+    HEAVY_FIELDS = ('code', 'judge_detail', 'compile_error', 'runtime_error', 'user_agent')
+    
     # 基本信息
     id = models.BigAutoField(primary_key=True)
     user = models.ForeignKey(
@@ -90,6 +106,7 @@ class Submission(models.Model):
     )
     code = models.TextField(verbose_name='源代码')
     code_length = models.IntegerField(verbose_name='代码长度')
+    code_hash = models.CharField(max_length=64, blank=True, verbose_name='代码哈希')
     
     # 判题信息
     status = models.CharField(
@@ -99,6 +116,35 @@ class Submission(models.Model):
         verbose_name='判题状态',
         db_index=True
     )
+    priority = models.SmallIntegerField(
+        choices=PRIORITY_CHOICES,
+        default=PRIORITY_PRACTICE,
+        verbose_name='判题优先级'
+    )
+    judge_server = models.ForeignKey(
+        'JudgeServer',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='submissions',
+        verbose_name='判题节点'
+    )
+    lease_expires_at = models.DateTimeField(null=True, blank=True, verbose_name='判题租约到期时间')
+    judge_deadline = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='判题截止时间',
+        help_text='本次判题最长允许到的时间，租约不会续到此时间之后'
+    )
+    judge_attempts = models.SmallIntegerField(default=0, verbose_name='判题次数')
+    rejudge_job = models.ForeignKey(
+        'RejudgeJob',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='submissions',
+        verbose_name='重新判题任务'
+    )
     result = models.CharField(
         max_length=10,
         choices=RESULT_CHOICES,
@@ -125,6 +171,9 @@ class Submission(models.Model):
     runtime_error = models.TextField(blank=True, verbose_name='运行时错误信息')
     error_testcase = models.IntegerField(null=True, blank=True, verbose_name='出错的测试用例编号')
     
+    # 判题时使用的测试数据版本
+    testdata_version = models.IntegerField(null=True, blank=True, verbose_name='测试数据版本')
+    
     # 判题详情（JSON）
     judge_detail = models.JSONField(
         null=True,
@@ -154,7 +203,11 @@ class Submission(models.Model):
             models.Index(fields=['user', 'problem']),
             models.Index(fields=['problem', 'result']),
             models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', 'priority', 'created_at']),
+            models.Index(fields=['status', 'lease_expires_at']),
             models.Index(fields=['user', 'result', 'created_at']),
+            models.Index(fields=['problem', 'language', 'code_hash']),
+            models.Index(fields=['created_at', 'id']),  # 提交列表键集分页
         ]
     
     def __str__(self):
@@ -238,10 +291,10 @@ class JudgeServer(models.Model):
     
     @property
     def is_online(self):
-        """是否在线（最近5分钟有心跳）"""
+        """是否在线（JUDGE_NODE_TIMEOUT 秒内有心跳）"""
         if not self.last_heartbeat:
             return False
-        return (timezone.now() - self.last_heartbeat).total_seconds() < 300
+        return (timezone.now() - self.last_heartbeat).total_seconds() < settings.JUDGE_NODE_TIMEOUT
     
     @property
     def load_percentage(self):
@@ -249,3 +302,103 @@ class JudgeServer(models.Model):
         if self.max_tasks == 0:
             return 100
         return int((self.task_count / self.max_tasks) * 100)
+
+
+
+class RejudgeJob(models.Model):
+    """重新判题任务：按批次把题目的历史提交放回队列"""
+    
+    STATUS_CHOICES = [
+        ('running', '进行中'),
+        ('finished', '已完成'),
+        ('cancelled', '已取消'),
+    ]
+    
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='rejudge_jobs',
+        verbose_name='题目'
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='rejudge_jobs',
+        verbose_name='创建者'
+    )
+    
+    # 筛选条件
+    results = models.CharField(max_length=100, blank=True, verbose_name='结果筛选')  # 逗号分隔，为空表示全部
+    submitted_after = models.DateTimeField(null=True, blank=True, verbose_name='提交时间起')
+    submitted_before = models.DateTimeField(null=True, blank=True, verbose_name='提交时间止')
+    
+    # 进度
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running', verbose_name='状态')
+    total = models.IntegerField(default=0, verbose_name='提交总数')
+    enqueued = models.IntegerField(default=0, verbose_name='已入队')
+    judged = models.IntegerField(default=0, verbose_name='已判完')
+    changed = models.IntegerField(default=0, verbose_name='结果变化数')
+    last_submission_id = models.IntegerField(default=0, verbose_name='已入队的最大提交ID')
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='完成时间')
+    
+    class Meta:
+        db_table = 'rejudge_jobs'
+        verbose_name = '重新判题任务'
+        verbose_name_plural = '重新判题任务'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"#{self.id} - {self.problem.title}"
+    
+    @property
+    def result_list(self):
+        """结果筛选列表"""
+        return [r.strip() for r in self.results.split(',') if r.strip()]
+    
+    @property
+    def progress(self):
+        """进度百分比"""
+        if self.total == 0:
+            return 100
+        return min(100, int(self.judged / self.total * 100))
+
+
+class SubmissionStat(models.Model):
+    """提交统计汇总：按日期、题目、语言、结果累计提交数，判题结果写入后增量更新"""
+    
+    day = models.DateField(verbose_name='日期')
+    class_scope = models.IntegerField(
+        default=0,
+        verbose_name='班级ID',
+        help_text='0表示全站，否则为提交者所在班级'
+    )
+    problem = models.ForeignKey(
+        Problem,
+        on_delete=models.CASCADE,
+        related_name='submission_stats',
+        verbose_name='题目'
+    )
+    language = models.ForeignKey(
+        Language,
+        on_delete=models.CASCADE,
+        related_name='submission_stats',
+        verbose_name='编程语言'
+    )
+    result = models.CharField(max_length=10, choices=Submission.RESULT_CHOICES, verbose_name='判题结果')
+    count = models.IntegerField(default=0, verbose_name='提交数')
+    
+    class Meta:
+        db_table = 'submission_stats'
+        verbose_name = '提交统计'
+        verbose_name_plural = '提交统计'
+        unique_together = [['class_scope', 'day', 'problem', 'language', 'result']]
+        indexes = [
+            models.Index(fields=['class_scope', 'problem', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.problem_id}/{self.language_id} {self.result}: {self.count}"
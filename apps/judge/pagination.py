@@ -0,0 +1,133 @@
+"""
+提交列表分页
+
+页码分页每页都要对过滤后的提交做一次 COUNT(*)，翻到深页时 OFFSET 还要扫描跳过的所有行。
+提交列表默认按 (created_at, id) 键集分页：游标记录上一页边界的提交时间和ID，
+每页只有一次走索引的查询，与翻到多深无关。
+带 page 或 ordering 参数时回退到页码分页，兼容旧客户端和按其他字段排序。
+"""
+
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor, PageNumberPagination
+from rest_framework.response import Response
+
+
+def approximate_count(queryset):
+    """
+    估计查询结果的行数
+
+    PostgreSQL 取查询计划中的估计行数（依赖表的统计信息，不扫描数据），其他数据库精确计数
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class SubmissionCursorPagination(CursorPagination):
+    """
+    提交列表键集分页
+
+    返回 next、previous 游标链接和 results；带 with_count=1 时 count 为估计的总数，否则为 None
+    """
+    ordering = ('-created_at', '-id')
+    count_query_param = 'with_count'
+    legacy_query_params = ('page', 'ordering')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = None
+        if any(request.query_params.get(param) for param in self.legacy_query_params):
+            self.legacy = PageNumberPagination()
+            page = self.legacy.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.legacy.display_page_controls
+            return page
+
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+        self.position = self.cursor.position if self.cursor else None
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = approximate_count(queryset)
+
+        # 向前翻页时反向排序，取到的结果再倒过来
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if self.position is not None:
+            created_at, pk = self._decode_position(self.position)
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            return self.legacy.get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def to_html(self):
+        if self.legacy:
+            return self.legacy.to_html()
+        return super().to_html()
+
+    def _get_position_from_instance(self, instance, ordering):
+        """游标位置：提交时间和ID"""
+        return f'{instance.created_at.isoformat()}|{instance.id}'
+
+    def _decode_position(self, position):
+        try:
+            created_at, pk = position.split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
@@ -0,0 +1,121 @@
+"""
+判题清理
+收回租约过期的提交，并清理判题进程异常退出后遗留的资源：
+工作目录池中的残留文件、旧版本判题在系统临时目录下的 judge_ 目录、
+容器池中创建者已退出的容器、本地沙箱后端的cgroup。
+资源清理只处理本机，需要在每个判题节点上运行。
+"""
+
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+
+import docker
+from django.conf import settings
+
+from .judge_queue import reap_expired_leases
+from .sandbox_native import remove_cgroup
+from .sandbox_pool import OWNER_LABEL, POOL_LABEL
+from .workspace_pool import get_workspace_pool
+
+
+# 旧版本判题在系统临时目录下创建的工作目录前缀
+TEMP_DIR_PREFIX = 'judge_'
+
+# 本地沙箱后端为每次判题创建的cgroup：sandbox_{进程号}_{序号}
+SANDBOX_CGROUP_PATTERN = re.compile(r'^sandbox_(\d+)_\d+$')
+
+
+def reap():
+    """执行全部清理，返回各项的数量"""
+    requeued, poisoned = reap_expired_leases()
+    stats = {
+        'requeued': requeued,
+        'poisoned': poisoned,
+        'workspaces': get_workspace_pool().sweep(),
+        'temp_dirs': sweep_temp_dirs(),
+        'containers': 0,
+        'cgroups': 0,
+    }
+    if settings.JUDGE_SANDBOX_BACKEND == 'docker':
+        try:
+            stats['containers'] = sweep_containers()
+        except docker.errors.DockerException as e:
+            print(f"[Reaper] 无法连接Docker，跳过容器清理: {str(e)}")
+    elif settings.JUDGE_SANDBOX_BACKEND == 'native':
+        stats['cgroups'] = sweep_cgroups()
+    return stats
+
+
+def sweep_temp_dirs(max_age=None):
+    """删除系统临时目录下超过max_age秒未修改的 judge_ 目录"""
+    if max_age is None:
+        max_age = settings.JUDGE_LEASE_TIMEOUT
+    root = tempfile.gettempdir()
+    deadline = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(root):
+        if not entry.name.startswith(TEMP_DIR_PREFIX) or not entry.is_dir(follow_symlinks=False):
+            continue
+        try:
+            if entry.stat(follow_symlinks=False).st_mtime >= deadline:
+                continue
+            shutil.rmtree(entry.path)
+            removed += 1
+        except OSError as e:
+            print(f"[Reaper] 删除临时目录失败: {entry.path}: {str(e)}")
+    return removed
+
+
+def sweep_containers(docker_client=None):
+    """删除本机上创建者进程已退出的池容器"""
+    client = docker_client or docker.from_env()
+    hostname = socket.gethostname()
+    removed = 0
+    for container in client.containers.list(all=True, filters={'label': POOL_LABEL}):
+        owner = container.labels.get(OWNER_LABEL, '')
+        host, _, pid = owner.rpartition(':')
+        if owner:
+            # 其他主机上的判题进程创建的容器由那台主机自己清理
+            if host != hostname or (pid.isdigit() and _process_alive(int(pid))):
+                continue
+        try:
+            container.remove(force=True)
+            removed += 1
+            print(f"[Reaper] 删除遗留容器: {container.short_id} ({owner or '无创建者'})")
+        except docker.errors.APIError as e:
+            print(f"[Reaper] 删除容器失败: {container.short_id}: {str(e)}")
+    return removed
+
+
+def sweep_cgroups():
+    """删除 JUDGE_RUNNER_CGROUP 下创建者进程已退出的判题cgroup，先结束其中残留的进程"""
+    root = settings.JUDGE_RUNNER_CGROUP
+    if not root or not os.path.isdir(root):
+        return 0
+    removed = 0
+    for entry in os.scandir(root):
+        match = SANDBOX_CGROUP_PATTERN.match(entry.name)
+        if not match or _process_alive(int(match.group(1))):
+            continue
+        try:
+            with open(os.path.join(entry.path, 'cgroup.kill'), 'w') as f:
+                f.write('1')
+        except OSError:
+            pass
+        if remove_cgroup(entry.path):
+            removed += 1
+    return removed
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,132 @@
+"""
+重新判题
+修改测试数据后按条件把题目的历史提交以最低优先级放回判题队列。
+提交按ID顺序分批入队，上一批剩余不足半批时才放入下一批，队列中不会积压上万条重判提交，
+正常提交始终优先。重判时只按结果变化增减通过数，不重复累计提交数。
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .counting import counted
+from .models import RejudgeJob, Submission
+from apps.problems.models import Problem
+
+
+def rejudge_queryset(job):
+    """任务涵盖的提交：任务创建前已判完的、符合筛选条件的提交"""
+    queryset = Submission.objects.filter(
+        problem_id=job.problem_id,
+        status__in=['finished', 'error'],
+        created_at__lte=job.created_at,
+    )
+    if job.result_list:
+        queryset = queryset.filter(result__in=job.result_list)
+    if job.submitted_after:
+        queryset = queryset.filter(created_at__gte=job.submitted_after)
+    if job.submitted_before:
+        queryset = queryset.filter(created_at__lte=job.submitted_before)
+    return queryset
+
+
+def create_rejudge_job(problem, user=None, results=None, submitted_after=None, submitted_before=None):
+    """创建重新判题任务并放入第一批提交"""
+    job = RejudgeJob.objects.create(
+        problem=problem,
+        created_by=user,
+        results=','.join(results or []),
+        submitted_after=submitted_after,
+        submitted_before=submitted_before,
+    )
+    job.total = rejudge_queryset(job).count()
+    job.save(update_fields=['total'])
+    print(f"[Rejudge] 创建任务 #{job.id}: {problem.title}，共 {job.total} 个提交")
+
+    advance_job(job.id)
+    job.refresh_from_db()
+    return job
+
+
+def advance_rejudge_jobs():
+    """推进所有进行中的任务：补充下一批提交，全部判完的任务标记为完成，返回入队的提交数"""
+    return sum(
+        advance_job(job_id)
+        for job_id in RejudgeJob.objects.filter(status='running').values_list('id', flat=True)
+    )
+
+
+def advance_job(job_id):
+    """推进一个任务，返回入队的提交数；多个判题节点同时调用时只有一个生效"""
+    batch_size = settings.JUDGE_REJUDGE_BATCH_SIZE
+    with transaction.atomic():
+        job = RejudgeJob.objects.select_for_update(skip_locked=True).filter(
+            id=job_id, status='running'
+        ).first()
+        if job is None:
+            return 0
+
+        waiting = job.submissions.filter(status__in=['pending', 'judging']).count()
+        if waiting > batch_size // 2:
+            return 0
+
+        ids = list(
+            rejudge_queryset(job)
+            .filter(id__gt=job.last_submission_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            if waiting == 0:
+                job.status = 'finished'
+                job.finished_at = timezone.now()
+                job.save(update_fields=['status', 'finished_at'])
+                print(f"[Rejudge] 任务 #{job.id} 完成，{job.changed} 个提交结果变化")
+            return 0
+
+        # 保留原结果，判完时据此计算通过数的变化；测试用例数按修改后的测试数据更新
+        test_cases_total = job.problem.test_cases.count()
+        count = Submission.objects.filter(id__in=ids).update(
+            status='pending',
+            test_cases_total=test_cases_total,
+            total_score=test_cases_total * 10,
+            priority=Submission.PRIORITY_REJUDGE,
+            rejudge_job=job,
+            judge_server=None,
+            lease_expires_at=None,
+            judge_deadline=None,
+            judge_attempts=0,
+        )
+        job.enqueued += count
+        job.last_submission_id = ids[-1]
+        job.save(update_fields=['enqueued', 'last_submission_id'])
+    return count
+
+
+def cancel_job(job):
+    """取消任务：尚未领取的提交恢复为原结果"""
+    with transaction.atomic():
+        RejudgeJob.objects.filter(id=job.id, status='running').update(
+            status='cancelled', finished_at=timezone.now()
+        )
+        waiting = Submission.objects.filter(rejudge_job=job, status='pending')
+        waiting.filter(Q(result__isnull=True) | Q(result='SE')).update(status='error')
+        waiting.update(status='finished')
+
+
+def record_rejudged(submission, previous_result):
+    """重判结果写入后更新任务进度，题目统计只按结果变化增减"""
+    new_result = submission.result
+    RejudgeJob.objects.filter(id=submission.rejudge_job_id).update(
+        judged=F('judged') + 1,
+        changed=F('changed') + (1 if new_result != previous_result else 0),
+    )
+    submit_delta = counted(new_result) - counted(previous_result)
+    accepted_delta = (new_result == 'AC') - (previous_result == 'AC')
+    if submit_delta or accepted_delta:
+        Problem.objects.filter(id=submission.problem_id).update(
+            total_submit=F('total_submit') + submit_delta,
+            total_accepted=F('total_accepted') + accepted_delta,
+        )
+
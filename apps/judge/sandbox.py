@@ -0,0 +1,89 @@
+"""
+判题沙箱后端
+Judger 只依赖这里定义的沙箱接口，具体隔离方式由 JUDGE_SANDBOX_BACKEND 选择：
+- docker: 预热的Docker容器池（sandbox_pool.DockerBackend），可移植性好
+- native: 宿主机上的命名空间进程沙箱（sandbox_native.NativeBackend），启动开销小
+也可以填写自定义后端类的完整路径
+"""
+
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+SANDBOX_BACKENDS = {
+    'docker': 'apps.judge.sandbox_pool.DockerBackend',
+    'native': 'apps.judge.sandbox_native.NativeBackend',
+}
+
+
+# 判题镜像中的非root用户，编译器和用户程序以该用户运行
+SANDBOX_USER = 'judger'
+SANDBOX_UID = 10001
+
+
+class SandboxError(Exception):
+    """沙箱本身出错（不是用户代码的问题），判题结果为系统错误"""
+
+
+class Sandbox:
+    """
+    一次判题使用的沙箱：宿主机上的工作目录，以及在隔离环境中执行命令的能力
+
+    后端需要提供的接口：
+    - workspace: 宿主机上的工作目录
+    - root: 沙箱内看到的工作目录路径
+    - image_id: 编译环境标识，用于编译缓存
+    - exec / exec_lines / set_memory_limit
+    """
+
+    root = '/workspace'
+    workspace = None
+    image_id = None
+    runner_path = None
+
+    def exec(self, command, user='root'):
+        """在沙箱内执行命令，返回 (退出码, 输出)"""
+        raise NotImplementedError
+
+    def exec_lines(self, command, user='root'):
+        """在沙箱内执行命令，逐行返回输出"""
+        raise NotImplementedError
+
+    def set_memory_limit(self, memory_limit):
+        """调整沙箱整体的内存限制(MB)"""
+        raise NotImplementedError
+
+    def runner_options(self):
+        """后端附加到判题清单中的选项"""
+        return {}
+
+    def runner_command(self, manifest_path):
+        return f'python3 {self.runner_path} {manifest_path}'
+
+    def run_runner(self, manifest):
+        """写入判题清单并执行运行器，逐行返回运行器的输出"""
+        manifest = dict(manifest, **self.runner_options())
+        # 清单只允许运行器读取，用户程序看不到其中的nonce
+        path = os.path.join(self.workspace, 'manifest.json')
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        # 运行器需要root写cgroup，由它在exec用户程序前切换到 SANDBOX_USER
+        return self.exec_lines(self.runner_command(f'{self.root}/manifest.json'), user='root')
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_sandbox_backend():
+    """获取进程内共享的沙箱后端"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = settings.JUDGE_SANDBOX_BACKEND
+            _backend = import_string(SANDBOX_BACKENDS.get(name, name))()
+        return _backend
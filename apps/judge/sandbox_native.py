@@ -0,0 +1,308 @@
+"""
+本地进程沙箱后端
+不经过Docker守护进程，直接在宿主机上用 unshare 创建 user/mount/pid/net/ipc/uts
+命名空间执行编译器和判题运行器，运行器再为每个测试用例 fork/exec 用户程序，
+设置 rlimit、seccomp 过滤器和独立的cgroup。
+
+命名空间内根文件系统只读，工作目录绑定到 /mnt/workspace，JUDGE_NATIVE_HIDDEN_PATHS
+中的目录（以及项目目录、测试数据、缓存和工作目录池）被空的tmpfs覆盖，进程在执行命令前
+丢弃全部capabilities。命令只继承最小的环境变量，不会看到判题进程的密钥和数据库配置。
+
+判题进程的uid映射为命名空间内的root，JUDGE_NATIVE_SUBUID 映射为判题用户（uid 10001）：
+编译器以判题用户运行，运行器以root运行并在exec用户程序前切换到判题用户，
+用户程序无法写入判题机创建的文件和目录。
+依赖 util-linux 的 unshare/setpriv 和 shadow-utils 的 newuidmap/newgidmap，
+需要内核允许非特权用户命名空间；开启 seccomp 时宿主机Python需要安装 libseccomp 的绑定（python3-seccomp）。
+"""
+
+import itertools
+import os
+import shlex
+import shutil
+import subprocess
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .sandbox import Sandbox, SandboxError, SANDBOX_UID
+from .workspace_pool import get_workspace_pool
+
+
+# 命名空间内挂载工作目录和运行器的位置
+MOUNT_POINT = '/mnt'
+
+# 命名空间准备完成后写入工作目录的标记文件，用于区分沙箱故障和命令本身失败
+READY_FILE = '.sandbox_ready'
+
+# 覆盖隐藏目录的tmpfs大小（编译器会在 /tmp 写临时文件）
+HIDDEN_TMPFS_SIZE = '64m'
+
+# 判题进程没有PATH环境变量时沙箱内使用的PATH
+DEFAULT_PATH = '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'
+
+_counter = itertools.count(1)
+
+
+class NativeSandbox(Sandbox):
+    """一次判题使用的命名空间沙箱"""
+
+    root = f'{MOUNT_POINT}/workspace'
+    runner_path = f'{MOUNT_POINT}/runner.py'
+
+    def __init__(self, workspace, image_id, cgroup=None):
+        self.workspace = workspace
+        self.image_id = image_id
+        self.cgroup = cgroup  # 本次判题的cgroup目录，未配置时为None
+        self.memory_limit = None
+
+    def exec(self, command, user='root'):
+        """在命名空间内执行命令，返回 (退出码, 输出)"""
+        self._clear_ready()
+        result = subprocess.run(
+            self._wrap(command, user),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self._env(),
+        )
+        output = result.stdout.decode('utf-8', errors='ignore')
+        self._check_ready(output)
+        return result.returncode, output
+
+    def exec_lines(self, command, user='root'):
+        """在命名空间内执行命令，逐行返回输出"""
+        self._clear_ready()
+        process = subprocess.Popen(
+            self._wrap(command, user),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=self._env(),
+        )
+        lines = []
+        try:
+            for raw in process.stdout:
+                line = raw.rstrip(b'\n').decode('utf-8', errors='ignore')
+                lines.append(line)
+                yield line
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        self._check_ready('\n'.join(lines[-20:]))
+
+    def set_memory_limit(self, memory_limit):
+        """设置本次判题cgroup的内存上限，未配置cgroup时由运行器按用例判定MLE"""
+        if self.cgroup is None or self.memory_limit == memory_limit:
+            return
+        _write(os.path.join(self.cgroup, 'memory.max'), str(memory_limit * 1024 * 1024))
+        swap_max = os.path.join(self.cgroup, 'memory.swap.max')
+        if os.path.exists(swap_max):
+            _write(swap_max, '0')
+        self.memory_limit = memory_limit
+
+    def runner_options(self):
+        # 运行器以命名空间内的root运行，用户程序在exec前切换到判题用户
+        return {
+            'cgroup': self.cgroup or '',
+            'seccomp': settings.JUDGE_NATIVE_SECCOMP,
+            'uid': SANDBOX_UID,
+        }
+
+    def runner_command(self, manifest_path):
+        return f'{settings.JUDGE_NATIVE_PYTHON} {self.runner_path} {manifest_path}'
+
+    def _env(self):
+        """沙箱内命令的环境变量，不继承判题进程的环境（其中有SECRET_KEY、数据库密码等）"""
+        return {
+            'PATH': os.environ.get('PATH', DEFAULT_PATH),
+            'LANG': 'C.UTF-8',
+            'HOME': self.root,
+        }
+
+    def _wrap(self, command, user='root'):
+        """生成在新命名空间内执行命令的完整命令行"""
+        setup = [
+            f'mount -t tmpfs -o size=16m,mode=755 tmpfs {MOUNT_POINT}',
+            f'mkdir {self.root}',
+            f'mount --bind {shlex.quote(self.workspace)} {self.root}',
+            f'cp {shlex.quote(settings.JUDGE_NATIVE_RUNNER_PATH)} {self.runner_path}',
+            f'mount -o remount,bind,ro {MOUNT_POINT}',
+            # 根文件系统只读（需在绑定工作目录之后，绑定挂载会继承只读属性），
+            # 其余挂载点（/proc、/sys、/dev）不受影响
+            'mount -o remount,bind,ro /',
+        ]
+        for path in _hidden_paths():
+            setup.append(
+                f'mount -t tmpfs -o size={HIDDEN_TMPFS_SIZE},mode=1777 tmpfs {shlex.quote(path)}'
+            )
+        setup.append(f': > {self.root}/{READY_FILE}')
+        setup.append(f'cd {self.root}')
+
+        # 丢弃capabilities，用户代码无法卸载上面的挂载；运行器只保留切换用户所需的
+        # setuid/setgid，切换后即全部失去，其他命令直接以判题用户执行
+        if user == 'root':
+            privileges = '--bounding-set=-all,+setuid,+setgid'
+        else:
+            privileges = f'--reuid={SANDBOX_UID} --regid={SANDBOX_UID} --clear-groups --bounding-set=-all'
+        inner = ' && '.join(setup) + f' && exec setpriv --no-new-privs {privileges} --inh-caps=-all ' \
+            + f'bash -c {shlex.quote(command)}'
+
+        outer = (
+            f'exec unshare {_map_options()} --mount --pid --fork --mount-proc '
+            f'--net --ipc --uts -- bash -c {shlex.quote(inner)}'
+        )
+        if self.cgroup is not None:
+            # 编译器和运行器都从 exec 子组启动，运行器随后自行移入 runner 子组
+            outer = f'echo $$ > {shlex.quote(os.path.join(self.cgroup, "exec", "cgroup.procs"))} && {outer}'
+        return ['bash', '-c', outer]
+
+    def _clear_ready(self):
+        try:
+            os.remove(os.path.join(self.workspace, READY_FILE))
+        except FileNotFoundError:
+            pass
+
+    def _check_ready(self, output):
+        if not os.path.exists(os.path.join(self.workspace, READY_FILE)):
+            raise SandboxError(f'命名空间沙箱启动失败: {output[-1000:]}')
+
+
+class NativeBackend:
+    """本地进程沙箱后端"""
+
+    name = 'native'
+
+    def __init__(self):
+        for tool in ('unshare', 'setpriv', 'newuidmap', 'newgidmap'):
+            if shutil.which(tool) is None:
+                raise ImproperlyConfigured(f'本地沙箱需要 {tool}（util-linux、shadow-utils）')
+        if settings.JUDGE_NATIVE_SUBUID <= 0 or settings.JUDGE_NATIVE_SUBUID == os.getuid():
+            raise ImproperlyConfigured(
+                '本地沙箱需要设置 JUDGE_NATIVE_SUBUID 为 /etc/subuid、/etc/subgid 中分配给判题进程用户的uid'
+            )
+        if not os.path.exists(settings.JUDGE_NATIVE_RUNNER_PATH):
+            raise ImproperlyConfigured(f'找不到判题运行器: {settings.JUDGE_NATIVE_RUNNER_PATH}')
+        if settings.JUDGE_NATIVE_SECCOMP:
+            check = subprocess.run(
+                [settings.JUDGE_NATIVE_PYTHON, '-c', 'import seccomp'],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            if check.returncode != 0:
+                raise ImproperlyConfigured(
+                    f'{settings.JUDGE_NATIVE_PYTHON} 缺少seccomp模块，'
+                    '请安装 python3-seccomp 或设置 JUDGE_NATIVE_SECCOMP=False'
+                )
+        self._toolchains = {}
+
+    @contextmanager
+    def sandbox(self, language):
+        with get_workspace_pool().workspace() as workspace:
+            # 判题用户需要在工作目录中写入编译产物；粘滞位使其无法删除判题机写入的文件
+            os.chmod(workspace, 0o1777)
+            cgroup = self._create_cgroup()
+            try:
+                yield NativeSandbox(workspace, self._toolchain_id(language), cgroup)
+            finally:
+                if cgroup is not None:
+                    remove_cgroup(cgroup)
+                clear_workspace(workspace)
+
+    def prewarm(self, languages):
+        """本地沙箱每次判题直接创建命名空间，没有需要预热的资源"""
+
+    def _toolchain_id(self, language):
+        """编译器路径和修改时间作为编译缓存的环境标识，编译器升级后缓存自动失效"""
+        command = language.compile_command or language.run_command
+        program = shlex.split(command)[0] if command else ''
+        if program not in self._toolchains:
+            path = shutil.which(program) or program
+            try:
+                mtime = int(os.stat(path).st_mtime)
+            except OSError:
+                mtime = 0
+            self._toolchains[program] = f'native:{path}:{mtime}'
+        return self._toolchains[program]
+
+    def _create_cgroup(self):
+        """在 JUDGE_RUNNER_CGROUP 下为本次判题创建子组"""
+        root = settings.JUDGE_RUNNER_CGROUP
+        if not root:
+            return None
+        path = os.path.join(root, f'sandbox_{os.getpid()}_{next(_counter)}')
+        try:
+            os.mkdir(path)
+            os.mkdir(os.path.join(path, 'exec'))
+        except OSError as e:
+            raise SandboxError(f'创建cgroup失败: {e}')
+        return path
+
+
+def remove_cgroup(path):
+    """删除判题使用的cgroup及其子组，成功返回True"""
+    for sub in ('runner', 'exec', ''):
+        try:
+            os.rmdir(os.path.join(path, sub) if sub else path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"[NativeSandbox] 删除cgroup失败: {path}: {str(e)}")
+            return False
+    return True
+
+
+def clear_workspace(path):
+    """
+    在用户命名空间内以root清空工作目录，成功返回True
+
+    判题用户创建的文件属于映射的子uid，判题进程本身可能无权删除其中的目录
+    """
+    result = subprocess.run(
+        ['bash', '-c', f'exec unshare {_map_options()} -- find {shlex.quote(path)} -mindepth 1 -delete'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env={'PATH': os.environ.get('PATH', DEFAULT_PATH)},
+    )
+    if result.returncode != 0:
+        output = result.stdout.decode('utf-8', errors='ignore')
+        print(f"[NativeSandbox] 清空工作目录失败: {path}: {output.strip()[-500:]}")
+        return False
+    return True
+
+
+def _map_options():
+    """unshare 的用户映射参数：判题进程映射为root，JUDGE_NATIVE_SUBUID 映射为判题用户"""
+    subuid = settings.JUDGE_NATIVE_SUBUID
+    return (
+        f'--user --map-root-user --map-users={subuid},{SANDBOX_UID},1 '
+        f'--map-groups={subuid},{SANDBOX_UID},1'
+    )
+
+
+def _write(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def _hidden_paths():
+    """需要隐藏的目录，去掉不存在的和已被上级目录覆盖的"""
+    # 项目目录、测试数据（含标准输出）、编译和测试数据缓存、其他判题的工作目录始终隐藏
+    always = [
+        settings.BASE_DIR,
+        settings.TESTDATA_ROOT,
+        settings.JUDGE_COMPILE_CACHE_DIR,
+        settings.JUDGE_TESTDATA_CACHE_DIR,
+        settings.JUDGE_WORKSPACE_ROOT,
+    ]
+    candidates = sorted(set(
+        os.path.normpath(str(p)) for p in settings.JUDGE_NATIVE_HIDDEN_PATHS + always
+    ))
+    hidden = []
+    for path in candidates:
+        if path in ('/', MOUNT_POINT) or not os.path.isdir(path):
+            continue
+        if any(path == h or path.startswith(h + os.sep) for h in hidden):
+            continue
+        hidden.append(path)
+    return hidden
@@ -0,0 +1,386 @@
+"""
+判题沙箱容器池
+为每个Docker镜像维护一组预先启动的容器，判题时通过exec执行编译和运行，
+避免每个测试用例都创建、等待、销毁一次容器
+
+容器被不同用户的提交轮流使用，因此根文件系统只读，编译器和用户程序以非root的
+judger 用户运行，只能写入 /workspace、/tmp 和 /dev/shm；每次归还时杀掉除
+init 和常驻进程外的所有进程并清空这些目录，有进程杀不掉的容器直接销毁
+"""
+
+import atexit
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import docker
+from django.conf import settings
+
+from .sandbox import Sandbox, SandboxError, SANDBOX_UID
+from .workspace_pool import get_workspace_pool
+
+
+# 池中容器的标签，用于识别和清理
+POOL_LABEL = 'oj-judge.pool'
+
+# 创建容器的判题进程（主机名:进程号），进程退出后由清理命令删除遗留的容器
+OWNER_LABEL = 'oj-judge.owner'
+
+# 容器内可写的目录，每次判题结束后清空
+WRITABLE_DIRS = ['/workspace', '/tmp', '/dev/shm']
+
+# 在容器内以root执行的重置脚本：杀掉除init、常驻进程和自身外的所有进程，
+# 再清空可写目录；超时后仍有进程残留时退出码为1
+RESET_SCRIPT = '''
+import os, shutil, signal, sys, time
+
+def ppid(pid):
+    with open('/proc/%d/stat' % pid) as f:
+        return int(f.read().rsplit(')', 1)[1].split()[1])
+
+def alive(pid):
+    try:
+        with open('/proc/%d/status' % pid) as f:
+            return 'State:\\tZ' not in f.read()
+    except OSError:
+        return False
+
+def leftovers():
+    keep = {1}
+    pid = os.getpid()
+    while pid > 1:
+        keep.add(pid)
+        try:
+            pid = ppid(pid)
+        except OSError:
+            break
+    pids = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit() or int(name) in keep:
+            continue
+        pid = int(name)
+        try:
+            with open('/proc/%d/cmdline' % pid, 'rb') as f:
+                cmdline = f.read()
+            if cmdline == b'sleep\\0infinity\\0' and ppid(pid) == 1 and os.stat('/proc/%d' % pid).st_uid == 0:
+                continue
+        except OSError:
+            continue
+        if alive(pid):
+            pids.append(pid)
+    return pids
+
+# 先以判题用户的身份 kill(-1)，一次杀掉该用户的全部进程（包括不断fork的进程）
+child = os.fork()
+if child == 0:
+    try:
+        os.setgroups([])
+        os.setgid(UID)
+        os.setuid(UID)
+        os.kill(-1, signal.SIGKILL)
+    finally:
+        os._exit(0)
+os.waitpid(child, 0)
+
+deadline = time.monotonic() + 2
+while True:
+    pids = leftovers()
+    if not pids:
+        break
+    if time.monotonic() > deadline:
+        sys.stderr.write('leftover processes: %s\\n' % pids)
+        sys.exit(1)
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+    time.sleep(0.05)
+
+for root in DIRS:
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+'''
+
+
+class PooledContainer(Sandbox):
+    """池中的单个容器"""
+
+    def __init__(self, image, container, slot, workspace_pool):
+        self.image = image
+        self.container = container
+        self.slot = slot
+        self.workspace_pool = workspace_pool
+        self.workspace = slot.path  # 宿主机上的tmpfs目录，挂载到容器内的 /workspace
+        self.runner_path = settings.JUDGE_RUNNER_PATH
+        self.image_id = container.attrs.get('Image')  # 镜像摘要，用于编译缓存
+        self.memory_limit = None  # 当前内存限制(MB)
+        self.last_used = time.time()
+
+    def exec(self, command, user='root'):
+        """在容器内执行命令，返回 (退出码, 输出)"""
+        return self._exec(['bash', '-c', command], user)
+
+    def _exec(self, argv, user):
+        result = self.container.exec_run(
+            argv,
+            workdir='/workspace',
+            user=user,
+        )
+        output = (result.output or b'').decode('utf-8', errors='ignore')
+        return result.exit_code, output
+
+    def exec_lines(self, command, user='root'):
+        """在容器内执行命令，逐行返回输出（用于读取运行器的流式结果）"""
+        result = self.container.exec_run(
+            ['bash', '-c', command],
+            workdir='/workspace',
+            user=user,
+            stream=True,
+        )
+        buffer = b''
+        for chunk in result.output:
+            buffer += chunk
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                yield line.decode('utf-8', errors='ignore')
+        if buffer:
+            yield buffer.decode('utf-8', errors='ignore')
+
+    def set_memory_limit(self, memory_limit):
+        """调整容器内存限制(MB)，与当前值相同时不发起请求"""
+        if self.memory_limit == memory_limit:
+            return
+        self.container.update(
+            mem_limit=f'{memory_limit}m',
+            memswap_limit=f'{memory_limit}m'
+        )
+        self.memory_limit = memory_limit
+
+    def runner_options(self):
+        # 运行器以root运行，用户程序在exec前切换到判题用户
+        return {'cgroup': settings.JUDGE_RUNNER_CGROUP, 'uid': SANDBOX_UID}
+
+    def reset(self):
+        """杀掉本次判题留下的所有进程并清空可写目录，供下一次判题复用"""
+        script = f'UID = {SANDBOX_UID}\nDIRS = {WRITABLE_DIRS!r}\n{RESET_SCRIPT}'
+        try:
+            # 文件由容器内root和判题用户创建，在容器内删除避免宿主机权限问题
+            exit_code, output = self._exec(['python3', '-c', script], 'root')
+        except Exception as e:
+            print(f"[ContainerPool] 重置容器失败: {str(e)}")
+            return False
+        if exit_code != 0:
+            print(f"[ContainerPool] 重置容器失败，销毁容器: {output.strip()[-500:]}")
+            return False
+        return True
+
+    def destroy(self):
+        """销毁容器，归还工作目录"""
+        try:
+            self.container.remove(force=True)
+        except Exception as e:
+            print(f"[ContainerPool] 删除容器失败: {str(e)}")
+        self.workspace_pool.release(self.slot)
+
+
+class ContainerPool:
+    """按镜像分组的预热容器池"""
+
+    def __init__(self, max_size=None, idle_timeout=None, docker_client=None, workspace_pool=None, min_size=None):
+        self.max_size = max_size or settings.JUDGE_POOL_MAX_SIZE
+        self.idle_timeout = idle_timeout or settings.JUDGE_POOL_IDLE_TIMEOUT
+        # 空闲回收时每个镜像至少保留的容器数
+        self.min_size = settings.JUDGE_POOL_PREWARM if min_size is None else min_size
+        self.docker_client = docker_client or docker.from_env()
+        self.workspace_pool = workspace_pool or get_workspace_pool()
+
+        self._cond = threading.Condition()
+        self._idle = {}   # image -> [PooledContainer]
+        self._total = {}  # image -> 已创建（空闲+使用中）的容器数
+
+    @contextmanager
+    def container(self, image):
+        """借出一个容器，使用结束后自动归还"""
+        pooled = self.acquire(image)
+        healthy = True
+        try:
+            yield pooled
+        except (docker.errors.APIError, SandboxError):
+            healthy = False
+            raise
+        finally:
+            self.release(pooled, healthy)
+
+    def acquire(self, image):
+        """借出容器，池已满时等待其他判题归还"""
+        with self._cond:
+            expired = self._collect_expired()
+            while True:
+                idle = self._idle.get(image)
+                if idle:
+                    pooled = idle.pop()
+                    break
+                if self._total.get(image, 0) < self.max_size:
+                    self._total[image] = self._total.get(image, 0) + 1
+                    pooled = None
+                    break
+                self._cond.wait()
+
+        for item in expired:
+            item.destroy()
+
+        if pooled is None:
+            try:
+                pooled = self._create(image)
+            except Exception:
+                with self._cond:
+                    self._total[image] -= 1
+                    self._cond.notify_all()
+                raise
+        return pooled
+
+    def release(self, pooled, healthy=True):
+        """归还容器，重置失败的容器直接销毁"""
+        if healthy:
+            healthy = pooled.reset()
+
+        with self._cond:
+            if healthy:
+                pooled.last_used = time.time()
+                self._idle.setdefault(pooled.image, []).append(pooled)
+            else:
+                self._total[pooled.image] -= 1
+            expired = self._collect_expired()
+            self._cond.notify_all()
+
+        if not healthy:
+            pooled.destroy()
+        for item in expired:
+            item.destroy()
+
+    def prewarm(self, image, count=1):
+        """预先启动指定数量的容器"""
+        containers = [self.acquire(image) for _ in range(min(count, self.max_size))]
+        for pooled in containers:
+            self.release(pooled)
+
+    def shutdown(self):
+        """销毁所有空闲容器"""
+        with self._cond:
+            containers = [c for idle in self._idle.values() for c in idle]
+            for pooled in containers:
+                self._total[pooled.image] -= 1
+            self._idle = {}
+        for pooled in containers:
+            pooled.destroy()
+
+    def _collect_expired(self):
+        """取出空闲超时的容器（需持有锁），由调用方在锁外销毁；每个镜像至少保留 min_size 个"""
+        deadline = time.time() - self.idle_timeout
+        expired = []
+        for image, idle in self._idle.items():
+            keep = []
+            # 空闲列表按归还时间排列，先回收最久未用的
+            for pooled in idle:
+                if pooled.last_used < deadline and self._total[image] > self.min_size:
+                    expired.append(pooled)
+                    self._total[image] -= 1
+                else:
+                    keep.append(pooled)
+            self._idle[image] = keep
+        return expired
+
+    def _acquire_workspace(self):
+        """为新容器借出工作目录，目录用完时先销毁本进程最久未用的空闲容器"""
+        while True:
+            slot = self.workspace_pool.acquire(block=False)
+            if slot is not None:
+                return slot
+
+            with self._cond:
+                victim = None
+                for idle in self._idle.values():
+                    for pooled in idle:
+                        if victim is None or pooled.last_used < victim.last_used:
+                            victim = pooled
+                if victim is not None:
+                    self._idle[victim.image].remove(victim)
+                    self._total[victim.image] -= 1
+
+            if victim is not None:
+                victim.destroy()
+            else:
+                # 目录被其他判题进程占用，等待归还
+                time.sleep(0.05)
+
+    def _create(self, image):
+        """启动一个常驻容器"""
+        slot = self._acquire_workspace()
+        try:
+            # 判题用户需要在工作目录中写入编译产物；粘滞位使其无法删除判题机写入的文件
+            os.chmod(slot.path, 0o1777)
+            container = self.docker_client.containers.run(
+                image=image,
+                command='sleep infinity',
+                volumes={slot.path: {'bind': '/workspace', 'mode': 'rw'}},
+                working_dir='/workspace',
+                detach=True,
+                mem_limit='512m',
+                memswap_limit='512m',
+                network_mode='none',
+                pids_limit=64,
+                user='root',
+                read_only=True,
+                tmpfs={'/tmp': 'rw,nosuid,nodev,size=64m,mode=1777'},
+                init=True,  # 由docker-init回收被杀进程的僵尸，常驻的sleep不会回收
+                labels={POOL_LABEL: '1', OWNER_LABEL: f'{socket.gethostname()}:{os.getpid()}'},
+            )
+        except Exception:
+            self.workspace_pool.release(slot)
+            raise
+
+        print(f"[ContainerPool] 启动容器: {image} ({container.short_id})")
+        pooled = PooledContainer(image, container, slot, self.workspace_pool)
+        pooled.memory_limit = 512
+        return pooled
+
+
+class DockerBackend:
+    """Docker沙箱后端：从容器池借出语言镜像对应的容器"""
+
+    name = 'docker'
+
+    def __init__(self, pool=None):
+        self.pool = pool or get_container_pool()
+
+    def sandbox(self, language):
+        return self.pool.container(language.docker_image)
+
+    def prewarm(self, languages):
+        """为各语言的镜像预先启动 JUDGE_POOL_PREWARM 个容器，第一份提交不必等待容器启动"""
+        for image in sorted({language.docker_image for language in languages}):
+            try:
+                self.pool.prewarm(image, settings.JUDGE_POOL_PREWARM)
+            except Exception as e:
+                print(f"[ContainerPool] 预热容器失败: {image}: {str(e)}")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_container_pool():
+    """获取进程内共享的容器池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ContainerPool()
+            atexit.register(_pool.shutdown)
+        return _pool
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Submission, Language
+from .models import Submission, Language, RejudgeJob
+from .verdict_cache import source_hash
+from .judge_queue import submission_priority
+from .rejudge import create_rejudge_job
 from apps.problems.models import Problem
 
 
@@ -145,12 +148,58 @@ class SubmissionCreateSerializer(serializers.ModelSerializer):
             language=language,
             code=code,
             code_length=code_length,
+            code_hash=source_hash(code),
             total_score=test_cases_total * 10,  # 每个测试用例10分
             test_cases_total=test_cases_total,
             ip_address=ip_address,
             user_agent=user_agent[:200],  # 限制长度
-            status='pending'
+            status='pending',
+            priority=submission_priority(request.user)
         )
         
         return submission
 
+
+
+class RejudgeJobSerializer(serializers.ModelSerializer):
+    """重新判题任务序列化器"""
+    
+    problem_id = serializers.IntegerField()
+    problem_title = serializers.CharField(source='problem.title', read_only=True)
+    created_by = serializers.CharField(source='created_by.username', read_only=True)
+    results = serializers.ListField(
+        child=serializers.ChoiceField(choices=Submission.RESULT_CHOICES),
+        source='result_list',
+        required=False
+    )
+    progress = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = RejudgeJob
+        fields = [
+            'id', 'problem_id', 'problem_title', 'created_by',
+            'results', 'submitted_after', 'submitted_before',
+            'status', 'total', 'enqueued', 'judged', 'changed', 'progress',
+            'created_at', 'finished_at'
+        ]
+        read_only_fields = [
+            'status', 'total', 'enqueued', 'judged', 'changed',
+            'created_at', 'finished_at'
+        ]
+    
+    def validate_problem_id(self, value):
+        """验证题目ID"""
+        if not Problem.objects.filter(id=value).exists():
+            raise serializers.ValidationError('题目不存在')
+        return value
+    
+    def create(self, validated_data):
+        """创建任务并放入第一批提交"""
+        request = self.context.get('request')
+        return create_rejudge_job(
+            Problem.objects.get(id=validated_data['problem_id']),
+            user=request.user,
+            results=validated_data.get('result_list'),
+            submitted_after=validated_data.get('submitted_after'),
+            submitted_before=validated_data.get('submitted_before'),
+        )
@@ -0,0 +1,138 @@
+"""
+提交统计汇总
+按 (日期, 题目, 语言, 结果) 累计提交数，判题结果写入后增量更新，
+statistics 接口只读汇总表，不再对提交表做全表分组统计。
+
+每条提交除计入全站（class_scope=0）外，还计入提交者判题时所在的每个班级，
+用于按班级筛选；学生加入班级之前的提交需用 rebuild_submission_stats 重建后才计入。
+只统计已有判题结果的提交，排队和判题中的提交不计入。
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Submission, SubmissionStat
+from apps.users.models import Class
+
+
+def record_verdict(submission, previous_result=None):
+    """
+    判题结果写入后更新汇总，在判题结果事务之外调用
+
+    previous_result 为重新判题前的结果（首次判题为None），重判时从原结果移到新结果
+    """
+    result = submission.result
+    if result == previous_result:
+        return
+
+    day = timezone.localdate(submission.created_at)
+    class_ids = Class.objects.filter(
+        students=submission.user_id,
+        is_active=True,
+    ).values_list('id', flat=True)
+    for scope in [0, *class_ids]:
+        key = {
+            'class_scope': scope,
+            'day': day,
+            'problem_id': submission.problem_id,
+            'language_id': submission.language_id,
+        }
+        if previous_result is not None:
+            _add(key, previous_result, -1)
+        if result is not None:
+            _add(key, result, 1)
+
+
+def _add(key, result, delta):
+    """单条UPDATE自增，行不存在时创建"""
+    rows = SubmissionStat.objects.filter(result=result, **key)
+    if rows.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            SubmissionStat.objects.create(result=result, count=delta, **key)
+    except IntegrityError:
+        # 其他判题进程同时创建了该行
+        rows.update(count=F('count') + delta)
+
+
+def summarize(start_date=None, end_date=None, problem_id=None, class_id=None):
+    """从汇总表统计提交数，日期范围包含两端"""
+    rows = SubmissionStat.objects.filter(class_scope=class_id or 0)
+    if start_date:
+        rows = rows.filter(day__gte=start_date)
+    if end_date:
+        rows = rows.filter(day__lte=end_date)
+    if problem_id:
+        rows = rows.filter(problem_id=problem_id)
+
+    result_stats = list(
+        rows.values('result')
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('-count')
+    )
+    language_stats = list(
+        rows.values('language__display_name')
+        .annotate(count=Sum('count'))
+        .filter(count__gt=0)
+        .order_by('-count')
+    )
+
+    total = sum(row['count'] for row in result_stats)
+    accepted = next((row['count'] for row in result_stats if row['result'] == 'AC'), 0)
+    ac_rate = (accepted / total * 100) if total > 0 else 0
+    return {
+        'total': total,
+        'accepted': accepted,
+        'ac_rate': round(ac_rate, 2),
+        'result_stats': result_stats,
+        'language_stats': language_stats,
+    }
+
+
+def rebuild(since=None, batch_size=1000):
+    """
+    从提交记录重建汇总，since 为起始日期（None 表示全部重建），返回写入的行数
+
+    按当前的班级成员关系计入班级统计
+    """
+    submissions = Submission.objects.filter(result__isnull=False)
+    stats = SubmissionStat.objects.all()
+    if since:
+        submissions = submissions.filter(created_at__date__gte=since)
+        stats = stats.filter(day__gte=since)
+
+    fields = ('day', 'problem_id', 'language_id', 'result')
+    site_rows = (
+        submissions
+        .annotate(day=TruncDate('created_at'))
+        .values(*fields)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    class_rows = (
+        submissions
+        .filter(user__enrolled_classes__is_active=True)
+        .annotate(day=TruncDate('created_at'), class_scope=F('user__enrolled_classes'))
+        .values('class_scope', *fields)
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    written = 0
+    with transaction.atomic():
+        stats.delete()
+        batch = []
+        for rows in (site_rows, class_rows):
+            for row in rows.iterator():
+                batch.append(SubmissionStat(**row))
+                if len(batch) >= batch_size:
+                    SubmissionStat.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+        SubmissionStat.objects.bulk_create(batch)
+        written += len(batch)
+    return written
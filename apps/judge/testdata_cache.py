@@ -0,0 +1,149 @@
+"""
+判题节点本地测试数据缓存
+测试数据存储（TESTDATA_ROOT）在多台判题机时是共享的网络存储，每个判题节点在本地磁盘上
+按内容哈希缓存用到的测试数据。判题前用题目的哈希清单（只查询哈希列）与本地文件比对，
+只拉取缺少的文件，未修改的数据不会重复拉取；修改过的用例哈希变化，自然拉取新数据。
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+
+from apps.problems.testdata import get_testdata_store
+
+
+class TestDataCache:
+    """本地磁盘上的测试数据缓存，按最近使用时间淘汰"""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or settings.JUDGE_TESTDATA_CACHE_DIR
+        self.max_bytes = max_bytes or settings.JUDGE_TESTDATA_CACHE_SIZE * 1024 * 1024
+        self._lock = threading.Lock()
+        self._total_bytes = None  # 首次拉取时统计
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def sync(self, test_cases):
+        """按测试用例的哈希清单补齐本地缺少的文件，返回拉取的文件数"""
+        fetched = 0
+        for digest in manifest(test_cases):
+            if not self._touch(digest):
+                self._fetch(digest)
+                fetched += 1
+        return fetched
+
+    def open(self, digest):
+        """以二进制流打开数据，本地没有时先拉取"""
+        try:
+            return open(self._local_path(digest), 'rb')
+        except FileNotFoundError:
+            # 刚好被其他进程淘汰
+            return open(self._fetch(digest), 'rb')
+
+    def copy_to(self, digest, dest):
+        """把数据复制到dest（复制而不是硬链接，沙箱内的程序不能改动缓存）"""
+        try:
+            shutil.copyfile(self._local_path(digest), dest)
+        except FileNotFoundError:
+            shutil.copyfile(self._fetch(digest), dest)
+
+    def _local_path(self, digest):
+        if self._touch(digest):
+            return self.path(digest)
+        return self._fetch(digest)
+
+    def _touch(self, digest):
+        """更新使用时间供LRU淘汰，本地没有时返回False"""
+        try:
+            os.utime(self.path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _fetch(self, digest):
+        """从测试数据存储拉取到本地（压缩保存的数据解压后缓存）"""
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='tmp_', dir=os.path.dirname(path))
+        os.close(fd)
+        try:
+            get_testdata_store().copy_to(digest, tmp_path)
+            # 原子地放入缓存，并发拉取同一份数据时内容相同，谁覆盖谁都可以
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._add_bytes(os.path.getsize(path))
+        return path
+
+    def _add_bytes(self, size):
+        """累计缓存大小，超出上限时淘汰最久未使用的文件"""
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += size
+            if self._total_bytes <= self.max_bytes:
+                return
+
+            entries = sorted(self._scan(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for path, size, _ in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._total_bytes = total
+            print(f"[TestDataCache] 淘汰 {removed} 个文件，剩余 {total // 1024 // 1024}MB")
+
+    def _scan(self):
+        """遍历缓存文件，返回 [(路径, 大小, 最后使用时间)]"""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.startswith('tmp_'):
+                    continue
+                try:
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_size, stat.st_mtime))
+                except OSError:
+                    # 其他进程正在淘汰该文件
+                    continue
+        return entries
+
+
+def manifest(test_cases):
+    """测试用例的哈希清单（去重）；尚未迁移到存储的用例没有哈希，不在清单中"""
+    if hasattr(test_cases, 'values_list'):
+        pairs = test_cases.values_list('input_hash', 'output_hash')
+    else:
+        pairs = [(tc.input_hash, tc.output_hash) for tc in test_cases]
+    return list(dict.fromkeys(digest for pair in pairs for digest in pair if digest))
+
+
+_cache = None
+
+
+def get_testdata_cache():
+    """获取进程内共享的测试数据缓存，未启用时返回None"""
+    global _cache
+    if not settings.JUDGE_TESTDATA_CACHE:
+        return None
+    if _cache is None:
+        _cache = TestDataCache()
+    return _cache
@@ -1,3 +1,112 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Language, Submission
+from apps.problems.models import Problem
+
+
+class SubmissionListQueryTests(TestCase):
+    """提交列表的查询次数不随每页的提交数增长"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        languages = [
+            Language.objects.create(
+                name=name, display_name=name, run_command='run', docker_image='image', file_extension='.x'
+            )
+            for name in ('c', 'cpp', 'python')
+        ]
+        problems = [
+            Problem.objects.create(
+                title=f'题目{i}', description='描述', input_format='输入', output_format='输出', status='published'
+            )
+            for i in range(5)
+        ]
+        users = [User.objects.create_user(f'user{i}', password='password') for i in range(5)]
+        Submission.objects.bulk_create([
+            Submission(
+                user=users[i % 5],
+                problem=problems[i % 5],
+                language=languages[i % 3],
+                code='print(1)',
+                code_length=8,
+                status='finished',
+                result='AC',
+                test_cases_total=1,
+                total_score=10,
+                ip_address='127.0.0.1',
+            )
+            for i in range(25)
+        ])
+
+    def test_submission_list(self):
+        client = APIClient()
+        # 键集分页不计数，每页只有一次联表查询
+        with self.assertNumQueries(1):
+            response = client.get('/judge/api/submissions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['problem_title'][:2], '题目')
+        self.assertIsNone(response.data['count'])
+
+        # 下一页同样只有一次查询，两页的提交不重复
+        with self.assertNumQueries(1):
+            next_page = client.get(response.data['next'])
+        self.assertEqual(len(next_page.data['results']), 5)
+        self.assertIsNone(next_page.data['next'])
+        ids = [s['id'] for s in response.data['results'] + next_page.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 25)
+
+        previous_page = client.get(next_page.data['previous'])
+        self.assertEqual([s['id'] for s in previous_page.data['results']], ids[:20])
+
+    def test_my_submissions(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username='user0'))
+        with self.assertNumQueries(1):
+            response = client.get('/judge/api/submissions/my_submissions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+        response = client.get('/judge/api/submissions/my_submissions/', {'with_count': 1})
+        self.assertEqual(response.data['count'], 5)
+
+    def test_page_number_mode(self):
+        client = APIClient()
+        # 带 page 参数时仍按页码分页
+        with self.assertNumQueries(2):
+            response = client.get('/judge/api/submissions/', {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 5)
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_admin_changelist(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/judge/submission/')
+        self.assertEqual(response.status_code, 200)
+
+        # 增加一页来自其他用户、题目的提交，查询次数不变
+        language = Language.objects.first()
+        for i in range(100):
+            Submission.objects.create(
+                user=User.objects.create(username=f'extra{i}'),
+                problem=Problem.objects.create(
+                    title=f'新题目{i}', description='描述', input_format='输入', output_format='输出'
+                ),
+                language=language,
+                code='print(1)',
+                code_length=8,
+                test_cases_total=1,
+                total_score=10,
+                ip_address='127.0.0.1',
+            )
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get('/admin/judge/submission/')
+        self.assertEqual(response.status_code, 200)
@@ -8,6 +8,7 @@ app_name = 'judge'
 router = DefaultRouter()
 router.register(r'submissions', views.SubmissionViewSet, basename='submission')
 router.register(r'languages', views.LanguageViewSet, basename='language')
+router.register(r'rejudge-jobs', views.RejudgeJobViewSet, basename='rejudge-job')
 
 urlpatterns = [
     # API endpoints
@@ -0,0 +1,46 @@
+"""
+判题结果缓存
+同一题目、同一语言、相同代码、相同测试数据版本的提交结果是确定的，
+直接复用之前的判题结果，不再占用沙箱
+"""
+
+import hashlib
+
+from .models import Submission
+
+
+def source_hash(code):
+    """计算规范化后的代码哈希
+
+    只统一换行符并去掉文件末尾的空白，行内和行尾空白可能位于字符串
+    字面量中，会影响程序输出，不做处理
+    """
+    normalized = code.replace('\r\n', '\n').replace('\r', '\n').rstrip()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def find_cached_verdict(submission, testdata_version, judged_after=None):
+    """查找可复用的历史判题结果，没有返回None
+
+    judged_after 限定只复用该时间之后判出的结果（重新判题时使用）；
+    系统错误和编译超时、编译进程被终止等偶然的结果（judge_detail 中带 transient 标记）不复用
+    """
+    if not submission.code_hash:
+        return None
+
+    queryset = Submission.objects.filter(
+        problem_id=submission.problem_id,
+        language_id=submission.language_id,
+        code_hash=submission.code_hash,
+        testdata_version=testdata_version,
+        status='finished',
+    ).exclude(
+        id=submission.id
+    ).exclude(
+        result='SE'
+    ).exclude(
+        judge_detail__has_key='transient'
+    )
+    if judged_after is not None:
+        queryset = queryset.filter(judged_at__gte=judged_after)
+    return queryset.order_by('-judged_at').first()
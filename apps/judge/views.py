@@ -5,15 +5,45 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import render, get_object_or_404
 from django.db import models
+from django.utils.dateparse import parse_date
 
-from .models import Submission, Language
+from .models import Submission, Language, RejudgeJob
 from .serializers import (
     SubmissionListSerializer,
     SubmissionDetailSerializer,
     SubmissionCodeSerializer,
     SubmissionCreateSerializer,
     LanguageSerializer,
+    RejudgeJobSerializer,
 )
+from .pagination import SubmissionCursorPagination
+from .rejudge import cancel_job
+from .submission_stats import summarize
+from apps.problems.models import Problem
+from apps.problems.permissions import IsTeacherOrAdmin
+from apps.users.models import Class
+
+
+def _date_param(value):
+    """解析 YYYY-MM-DD 格式的日期参数，格式错误时抛出 ValueError"""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+def _can_view_class(user, class_id):
+    """与班级列表的可见范围一致：管理员看全部，老师看自己的班级，学生看已加入的班级"""
+    if user.is_staff or user.is_superuser:
+        return True
+    if not user.is_authenticated:
+        return False
+    return Class.objects.filter(
+        models.Q(teacher=user) | models.Q(students=user),
+        id=class_id,
+    ).exists()
 
 
 class LanguageViewSet(viewsets.ReadOnlyModelViewSet):
@@ -34,6 +64,7 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     search_fields = ['user__username', 'problem__title']
     ordering_fields = ['id', 'created_at', 'score', 'time_used', 'memory_used']
     ordering = ['-created_at']
+    pagination_class = SubmissionCursorPagination
     
     def get_serializer_class(self):
         """根据action选择序列化器"""
@@ -53,7 +84,14 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """获取查询集"""
-        queryset = super().get_queryset()
+        # 用户、题目和语言随提交一次联表查出，题面不需要读取
+        queryset = super().get_queryset().select_related('user', 'problem', 'language').defer(
+            *[f'problem__{field}' for field in Problem.HEAVY_FIELDS]
+        )
+        
+        # 列表不返回代码和判题详情，不从数据库读取这些列
+        if self.action in ['list', 'my_submissions']:
+            queryset = queryset.defer(*Submission.HEAVY_FIELDS)
         
         # 非管理员只能看到自己的提交和公开的提交
         user = self.request.user
@@ -75,25 +113,11 @@ class SubmissionViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         submission = serializer.save()
         
-        # 同步判题（Phase 2）
-        # TODO: Phase 3将改为异步Celery任务
-        from .judger import judge_submission
-        import threading
-        
-        # 在后台线程中判题，避免阻塞API响应
-        def judge_in_background():
-            try:
-                judge_submission(submission.id)
-            except Exception as e:
-                print(f"[Judge Error] {str(e)}")
-        
-        thread = threading.Thread(target=judge_in_background)
-        thread.start()
-        
+        # 提交以 pending 状态进入数据库队列，由 judge_worker 进程领取判题
         return Response({
             'id': submission.id,
             'status': submission.status,
-            'message': '提交成功，正在判题...'
+            'message': '提交成功，等待判题...'
         }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
@@ -133,32 +157,60 @@ class SubmissionViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """提交统计"""
-        from django.db.models import Count, Q
-        
-        queryset = self.get_queryset()
-        
-        # 按结果统计
-        result_stats = queryset.values('result').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # 按语言统计
-        language_stats = queryset.values(
-            'language__display_name'
-        ).annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # 总体统计
-        total = queryset.count()
-        accepted = queryset.filter(result='AC').count()
-        ac_rate = (accepted / total * 100) if total > 0 else 0
-        
-        return Response({
-            'total': total,
-            'accepted': accepted,
-            'ac_rate': round(ac_rate, 2),
-            'result_stats': list(result_stats),
-            'language_stats': list(language_stats),
-        })
+        """
+        提交统计（从提交统计汇总表读取）
+
+        可选参数: start_date、end_date（YYYY-MM-DD，包含两端）、problem、class
+
+        按班级统计只对管理员、该班级的老师和学生开放
+        """
+        params = request.query_params
+        try:
+            start_date = _date_param(params.get('start_date'))
+            end_date = _date_param(params.get('end_date'))
+            problem_id = int(params.get('problem') or 0)
+            class_id = int(params.get('class') or 0)
+        except ValueError:
+            return Response(
+                {'error': '参数格式错误'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if class_id and not _can_view_class(request.user, class_id):
+            return Response(
+                {'error': '您没有权限查看此班级的统计'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        return Response(summarize(
+            start_date=start_date,
+            end_date=end_date,
+            problem_id=problem_id,
+            class_id=class_id,
+        ))
+
+
+class RejudgeJobViewSet(viewsets.ModelViewSet):
+    """重新判题任务视图集（老师和管理员）"""
+    
+    queryset = RejudgeJob.objects.select_related('problem', 'created_by')
+    serializer_class = RejudgeJobSerializer
+    permission_classes = [IsAuthenticated, IsTeacherOrAdmin]
+    http_method_names = ['get', 'post', 'head', 'options']
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['problem', 'status']
+    
+    def get_queryset(self):
+        """非管理员只能看到自己创建的任务"""
+        queryset = super().get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """取消任务，尚未开始判题的提交恢复原结果"""
+        job = self.get_object()
+        cancel_job(job)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data)
@@ -0,0 +1,185 @@
+"""
+判题工作目录池
+在内存文件系统(tmpfs)上预先创建固定数量的工作目录，判题时借出、用完清空后复用，
+避免每次判题在系统盘上创建和删除目录，测试数据和程序输出也不再落盘。
+同一节点上的所有判题进程通过文件锁共享这些目录。
+根目录所在的文件系统不能超过 JUDGE_WORKSPACE_MAX_SIZE，失控的输出和编译器临时文件
+只会写满这块单独挂载的内存盘，不会占满宿主机的 /dev/shm 或磁盘。
+"""
+
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import fcntl
+except ImportError:  # Windows开发环境没有fcntl，退化为进程内分配
+    fcntl = None
+
+
+class WorkspaceSlot:
+    """借出的工作目录"""
+
+    def __init__(self, index, path, fd):
+        self.index = index
+        self.path = path
+        self.fd = fd  # 锁文件描述符，持有期间其他进程无法借出
+
+
+class WorkspacePool:
+    """固定数量的可复用工作目录"""
+
+    def __init__(self, root=None, slots=None):
+        self.root = root or settings.JUDGE_WORKSPACE_ROOT
+        self.slots = slots or settings.JUDGE_WORKSPACE_SLOTS
+        self._ready = False
+        self._local = set()  # 没有fcntl时记录本进程已借出的目录
+
+    def setup(self):
+        """首次使用时创建目录；根目录所在文件系统超过大小上限时拒绝使用，不在tmpfs上时给出提示"""
+        if self._ready:
+            return
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        size = _filesystem_size(self.root)
+        if size > settings.JUDGE_WORKSPACE_MAX_SIZE * 1024 * 1024:
+            raise ImproperlyConfigured(
+                f'工作目录池 {self.root} 所在文件系统大小为 {size // (1024 * 1024)}MB，'
+                f'超过 JUDGE_WORKSPACE_MAX_SIZE={settings.JUDGE_WORKSPACE_MAX_SIZE}MB，'
+                '请为其单独挂载限定大小的tmpfs'
+            )
+        for index in range(self.slots):
+            os.makedirs(self._slot_path(index), mode=0o700, exist_ok=True)
+        if not _is_tmpfs(self.root):
+            print(f"[WorkspacePool] 警告: {self.root} 不在tmpfs上，工作目录会写入磁盘")
+        self._ready = True
+
+    def _slot_path(self, index):
+        return os.path.join(self.root, f'slot{index}')
+
+    @contextmanager
+    def workspace(self):
+        """借出一个工作目录，使用结束后清空归还"""
+        slot = self.acquire()
+        try:
+            yield slot.path
+        finally:
+            self.release(slot)
+
+    def acquire(self, block=True):
+        """借出空闲的工作目录，block为False时没有空闲目录返回None"""
+        self.setup()
+        while True:
+            for index in range(self.slots):
+                slot = self._try_lock(index)
+                if slot is None:
+                    continue
+                # 上一个使用者可能异常退出，借出前再清空一次，清不干净的目录不使用
+                if clear_directory(slot.path):
+                    return slot
+                self._unlock(slot)
+            if not block:
+                return None
+            time.sleep(0.05)
+
+    def release(self, slot):
+        """清空并归还工作目录"""
+        if not clear_directory(slot.path):
+            print(f"[WorkspacePool] 清空工作目录失败: {slot.path}")
+        self._unlock(slot)
+
+    def sweep(self):
+        """清空所有空闲目录中判题进程异常退出后残留的文件，返回清理的目录数"""
+        self.setup()
+        cleaned = 0
+        for index in range(self.slots):
+            slot = self._try_lock(index)
+            if slot is None:
+                continue
+            try:
+                if os.listdir(slot.path):
+                    clear_directory(slot.path)
+                    cleaned += 1
+            finally:
+                self._unlock(slot)
+        return cleaned
+
+    def _try_lock(self, index):
+        if fcntl is None:
+            if index in self._local:
+                return None
+            self._local.add(index)
+            return WorkspaceSlot(index, self._slot_path(index), None)
+
+        fd = os.open(f'{self._slot_path(index)}.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return WorkspaceSlot(index, self._slot_path(index), fd)
+
+    def _unlock(self, slot):
+        if slot.fd is None:
+            self._local.discard(slot.index)
+            return
+        fcntl.flock(slot.fd, fcntl.LOCK_UN)
+        os.close(slot.fd)
+
+
+def clear_directory(path):
+    """删除目录下的所有内容（保留目录本身），全部删除成功返回True"""
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        return True
+
+    ok = True
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
+            else:
+                os.remove(entry.path)
+        except OSError:
+            ok = False
+    return ok
+
+
+def _filesystem_size(path):
+    """路径所在文件系统的总大小（字节）"""
+    stat = os.statvfs(path)
+    return stat.f_blocks * stat.f_frsize
+
+
+def _is_tmpfs(path):
+    """判断路径所在的文件系统是否为tmpfs"""
+    try:
+        with open('/proc/mounts', 'r') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    for fields in mounts:
+        mount_point = fields[1]
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) \
+                and len(mount_point) > len(best):
+            best, fstype = mount_point, fields[2]
+    return fstype == 'tmpfs'
+
+
+_pool = None
+
+
+def get_workspace_pool():
+    """获取进程内共享的工作目录池"""
+    global _pool
+    if _pool is None:
+        _pool = WorkspacePool()
+    return _pool
@@ -1,6 +1,14 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
 from django.utils.html import format_html
 from .models import Problem, ProblemTag, ProblemSample, TestCase, UserProblemStatus
+from .testdata_archive import TestDataArchiveError, export_testcases, import_testcases
+
+
+# 测试数据不超过该大小时在表单中直接编辑，更大的只能上传文件替换
+TESTDATA_EDIT_LIMIT = 64 * 1024
 
 
 @admin.register(ProblemTag)
@@ -25,14 +33,69 @@ class ProblemSampleInline(admin.TabularInline):
     ordering = ['order']
 
 
+class TestCaseForm(forms.ModelForm):
+    """测试用例表单：较小的文本数据直接编辑，较大的或二进制数据上传文件"""
+    input_file = forms.FileField(required=False, label='输入文件', help_text='上传后替换输入数据')
+    output_file = forms.FileField(required=False, label='输出文件', help_text='上传后替换输出数据')
+    
+    class Meta:
+        model = TestCase
+        fields = '__all__'
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for kind in ('input', 'output'):
+            field = self.fields.get(f'{kind}_data')
+            if field is None:
+                continue
+            field.strip = False
+            # 清空文本框表示空数据，不是NULL（NULL表示不修改）
+            field.empty_value = ''
+            if self.instance.pk:
+                self._load_initial(kind, field)
+    
+    def _load_initial(self, kind, field):
+        """从测试数据存储读出现有数据作为初始值"""
+        size = getattr(self.instance, f'{kind}_size')
+        if size > TESTDATA_EDIT_LIMIT:
+            field.help_text = f'数据较大（{size} 字节），留空保持不变，修改请上传文件'
+            return
+        try:
+            self.initial[f'{kind}_data'] = self.instance.read_data(kind).decode('utf-8')
+        except UnicodeDecodeError:
+            field.help_text = f'二进制数据（{size} 字节），留空保持不变，修改请上传文件'
+    
+    def save(self, commit=True):
+        instance = super().save(commit=False)
+        for kind in ('input', 'output'):
+            upload = self.cleaned_data.get(f'{kind}_file')
+            if upload:
+                instance.set_data(kind, upload)
+            elif instance.pk and f'{kind}_data' not in self.changed_data:
+                # 未修改时不重新写入存储
+                setattr(instance, f'{kind}_data', None)
+        if commit:
+            instance.save()
+        return instance
+
+
+class TestCaseImportForm(forms.Form):
+    """测试数据压缩包上传表单"""
+    file = forms.FileField(label='zip压缩包', help_text='包含成对的 1.in/1.out、2.in/2.out ... 文件')
+    replace = forms.BooleanField(label='替换原有的测试用例', required=False)
+
+
 class TestCaseInline(admin.StackedInline):
     """测试用例内联编辑"""
     model = TestCase
+    form = TestCaseForm
     extra = 1
     fields = [
         'order',
         'input_data',
+        'input_file',
         'output_data',
+        'output_file',
         'is_sample',
         'score',
         'time_limit',
@@ -87,7 +150,7 @@ class ProblemAdmin(admin.ModelAdmin):
             'fields': ('description', 'input_format', 'output_format', 'hint', 'source')
         }),
         ('限制条件', {
-            'fields': ('time_limit', 'memory_limit', 'is_special_judge')
+            'fields': ('time_limit', 'memory_limit', 'output_limit', 'is_special_judge')
         }),
         ('统计信息', {
             'fields': ('total_submit', 'total_accepted')
@@ -146,13 +209,24 @@ class ProblemAdmin(admin.ModelAdmin):
         )
     acceptance_rate_display.short_description = '通过率'
     
+    def get_queryset(self, request):
+        """列表页不加载题面"""
+        queryset = super().get_queryset(request)
+        changelist = f'{self.opts.app_label}_{self.opts.model_name}_changelist'
+        if request.resolver_match and request.resolver_match.url_name == changelist:
+            queryset = queryset.defer(*Problem.HEAVY_FIELDS)
+        return queryset
+    
     def save_model(self, request, obj, form, change):
         """保存时自动设置创建者"""
         if not change:  # 新创建
             obj.created_by = request.user
         super().save_model(request, obj, form, change)
     
-    actions = ['publish_problems', 'hide_problems', 'draft_problems']
+    actions = [
+        'publish_problems', 'hide_problems', 'draft_problems', 'rejudge_problems',
+        'import_testcases', 'export_testcases',
+    ]
     
     def publish_problems(self, request, queryset):
         """批量发布题目"""
@@ -171,6 +245,55 @@ class ProblemAdmin(admin.ModelAdmin):
         count = queryset.update(status='draft')
         self.message_user(request, f'成功将 {count} 个题目转为草稿')
     draft_problems.short_description = '转为草稿'
+    
+    def rejudge_problems(self, request, queryset):
+        """重新判题选中题目的全部提交"""
+        from apps.judge.rejudge import create_rejudge_job
+        
+        total = 0
+        for problem in queryset:
+            job = create_rejudge_job(problem, user=request.user)
+            total += job.total
+        self.message_user(request, f'已创建 {queryset.count()} 个重新判题任务，共 {total} 个提交')
+    rejudge_problems.short_description = '重新判题'
+    
+    def import_testcases(self, request, queryset):
+        """从zip压缩包批量导入测试用例（先显示上传页面，上传后导入）"""
+        if queryset.count() != 1:
+            self.message_user(request, '请选择一个题目导入测试数据', messages.WARNING)
+            return None
+        problem = queryset.first()
+        
+        form = TestCaseImportForm(request.POST, request.FILES) if 'apply' in request.POST else TestCaseImportForm()
+        if form.is_valid():
+            try:
+                count = import_testcases(problem, form.cleaned_data['file'], replace=form.cleaned_data['replace'])
+            except TestDataArchiveError as e:
+                form.add_error('file', str(e))
+            else:
+                self.message_user(request, f'{problem.title}: 成功导入 {count} 个测试用例')
+                return None
+        
+        return render(request, 'admin/problems/import_testcases.html', {
+            **self.admin_site.each_context(request),
+            'title': f'导入测试数据: {problem.title}',
+            'opts': self.model._meta,
+            'problem': problem,
+            'form': form,
+            'action_checkbox_name': admin.helpers.ACTION_CHECKBOX_NAME,
+        })
+    import_testcases.short_description = '导入测试数据(zip)'
+    
+    def export_testcases(self, request, queryset):
+        """把测试用例导出为zip压缩包"""
+        if queryset.count() != 1:
+            self.message_user(request, '请选择一个题目导出测试数据', messages.WARNING)
+            return None
+        problem = queryset.first()
+        response = StreamingHttpResponse(export_testcases(problem), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="problem_{problem.id}_testcases.zip"'
+        return response
+    export_testcases.short_description = '导出测试数据(zip)'
 
 
 @admin.register(ProblemSample)
@@ -206,26 +329,46 @@ class TestCaseAdmin(admin.ModelAdmin):
         'memory_limit_display'
     ]
     list_filter = ['is_sample', 'problem__difficulty', 'problem']
-    search_fields = ['problem__title', 'input_data', 'output_data']
+    search_fields = ['problem__title']
     ordering = ['problem', 'order']
+    form = TestCaseForm
+    readonly_fields = [
+        'input_hash', 'input_size', 'input_lines',
+        'output_hash', 'output_size', 'output_lines'
+    ]
     
     fieldsets = (
         ('基本信息', {
             'fields': ('problem', 'order', 'is_sample', 'score')
         }),
         ('测试数据', {
-            'fields': ('input_data', 'output_data'),
+            'fields': ('input_data', 'input_file', 'output_data', 'output_file'),
             'description': '⚠️ 输入输出数据末尾必须包含换行符 \\n'
         }),
+        ('存储信息', {
+            'fields': (
+                'input_hash', 'input_size', 'input_lines',
+                'output_hash', 'output_size', 'output_lines'
+            ),
+            'classes': ('collapse',)
+        }),
         ('资源限制', {
             'fields': ('time_limit', 'memory_limit'),
             'description': '留空则使用题目默认限制'
         }),
     )
     
+    def get_queryset(self, request):
+        """列表页不加载数据列，预览使用保存的预览列"""
+        queryset = super().get_queryset(request)
+        changelist = f'{self.opts.app_label}_{self.opts.model_name}_changelist'
+        if request.resolver_match and request.resolver_match.url_name == changelist:
+            queryset = queryset.defer(*TestCase.HEAVY_FIELDS)
+        return queryset
+    
     def input_preview(self, obj):
         """输入数据预览"""
-        data = obj.input_data
+        data = obj.input_excerpt
         if not data:
             return format_html('<span style="color: #999;">无</span>')
         preview = data[:30].replace('\n', '↵')
@@ -239,7 +382,7 @@ class TestCaseAdmin(admin.ModelAdmin):
     
     def output_preview(self, obj):
         """输出数据预览"""
-        data = obj.output_data
+        data = obj.output_excerpt
         if not data:
             return format_html('<span style="color: #999;">无</span>')
         preview = data[:30].replace('\n', '↵')
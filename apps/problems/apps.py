@@ -5,4 +5,8 @@ class ProblemsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.problems'
     verbose_name = '题目管理'
+    
+    def ready(self):
+        """应用就绪时导入信号"""
+        import apps.problems.signals
 
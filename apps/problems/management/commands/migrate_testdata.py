@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.problems.models import EXCERPT_LENGTH, TestCase, make_excerpt
+from apps.problems.testdata import get_testdata_store
+
+
+class Command(BaseCommand):
+    help = '把数据库中的测试用例数据迁移到测试数据存储，并清空数据库中的数据列；补全缺少的预览'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='每批读取的测试用例数'
+        )
+
+    def handle(self, *args, **options):
+        pending = TestCase.objects.filter(
+            Q(input_hash='') | Q(output_hash='')
+            | Q(input_size__gt=0, input_excerpt='') | Q(output_size__gt=0, output_excerpt='')
+        )
+        total = pending.count()
+        self.stdout.write(f'需要迁移 {total} 个测试用例')
+
+        migrated = 0
+        stored_bytes = 0
+        last_id = 0
+        while True:
+            # 按ID分批读取，每批只把这些行的数据读入内存
+            batch = list(pending.filter(id__gt=last_id).order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            for testcase in batch:
+                fields = {}
+                for kind in ('input', 'output'):
+                    digest = getattr(testcase, f'{kind}_hash')
+                    if digest:
+                        # 已在存储中，只补全预览
+                        if getattr(testcase, f'{kind}_size') and not getattr(testcase, f'{kind}_excerpt'):
+                            data = get_testdata_store().read(digest, EXCERPT_LENGTH * 4)
+                            fields[f'{kind}_excerpt'] = make_excerpt(data)
+                        continue
+                    testcase.set_data(kind, getattr(testcase, f'{kind}_data') or '')
+                    stored_bytes += getattr(testcase, f'{kind}_size')
+                    for field in ('data', 'hash', 'size', 'lines', 'excerpt'):
+                        fields[f'{kind}_{field}'] = getattr(testcase, f'{kind}_{field}')
+                # 数据内容不变，直接更新，不触发测试数据版本递增
+                TestCase.objects.filter(pk=testcase.pk).update(**fields)
+                migrated += 1
+            last_id = batch[-1].id
+            self.stdout.write(f'已迁移 {migrated}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'迁移完成: {migrated} 个测试用例，{stored_bytes} 字节'
+        ))
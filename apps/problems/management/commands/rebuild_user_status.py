@@ -0,0 +1,52 @@
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from apps.problems.user_status import rebuild_for_users
+from apps.users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = '从提交记录重建用户题目状态（UserProblemStatus）和用户的总提交数、通过、尝试题目数'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='每批重建的用户数'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id').values_list('id', flat=True)
+        total = users.count()
+        self.stdout.write(f'需要重建 {total} 个用户的题目状态')
+
+        done = 0
+        rebuilt = 0
+        last_id = 0
+        while True:
+            # 按用户ID分批，每批在一个事务中删除并重新写入
+            user_ids = list(users.filter(id__gt=last_id)[:options['batch_size']])
+            if not user_ids:
+                break
+            statuses = rebuild_for_users(user_ids)
+
+            # 题目状态中的提交次数已按 apps.judge.counting 的定义统计
+            submitted = Counter()
+            for s in statuses:
+                submitted[s.user_id] += s.submit_count
+            accepted = Counter(s.user_id for s in statuses if s.status == 'accepted')
+            tried = Counter(s.user_id for s in statuses)
+            profiles = list(UserProfile.objects.filter(user_id__in=user_ids))
+            for profile in profiles:
+                profile.total_submit = submitted[profile.user_id]
+                profile.total_accepted = accepted[profile.user_id]
+                profile.total_tried = tried[profile.user_id]
+            UserProfile.objects.bulk_update(profiles, ['total_submit', 'total_accepted', 'total_tried'])
+
+            done += len(user_ids)
+            rebuilt += len(statuses)
+            last_id = user_ids[-1]
+            self.stdout.write(f'已重建 {done}/{total} 个用户')
+
+        self.stdout.write(self.style.SUCCESS(f'重建完成: {rebuilt} 条题目状态'))
@@ -1,7 +1,21 @@
+import io
+
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
 
+from .testdata import get_testdata_store
+
+
+# 测试用例预览保存的字符数
+EXCERPT_LENGTH = 64
+
+
+def make_excerpt(data):
+    """数据开头的预览文本（二进制数据按UTF-8替换字符显示，去掉数据库不能保存的NUL）"""
+    return data.decode('utf-8', errors='replace').replace('\x00', '\ufffd')[:EXCERPT_LENGTH]
+
 
 class ProblemTag(models.Model):
     """题目标签"""
@@ -37,6 +51,9 @@ class Problem(models.Model):
         ('hidden', '已隐藏'),
     ]
     
+    # 体积较大的列，列表查询不加载
+    HEAVY_FIELDS = ('description', 'input_format', 'output_format', 'hint')
+    
     # 基本信息
     title = models.CharField(max_length=200, verbose_name='题目标题', db_index=True)
     description = models.TextField(verbose_name='题目描述')
@@ -48,6 +65,7 @@ class Problem(models.Model):
     # 限制条件
     time_limit = models.IntegerField(default=1000, verbose_name='时间限制(ms)')
     memory_limit = models.IntegerField(default=256, verbose_name='内存限制(MB)')
+    output_limit = models.IntegerField(default=64, verbose_name='输出限制(KB)')
     
     # 难度和分类
     difficulty = models.CharField(
@@ -78,6 +96,9 @@ class Problem(models.Model):
     total_submit = models.IntegerField(default=0, verbose_name='总提交数')
     total_accepted = models.IntegerField(default=0, verbose_name='通过数')
     
+    # 测试数据版本（测试用例或资源限制变化时递增，用于判题结果缓存）
+    testdata_version = models.IntegerField(default=0, verbose_name='测试数据版本')
+    
     # 创建和修改信息
     created_by = models.ForeignKey(
         User,
@@ -105,6 +126,32 @@ class Problem(models.Model):
     def __str__(self):
         return f"{self.id}. {self.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """记录加载时的资源限制，保存时判断是否变化"""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_limits = (
+            instance.__dict__.get('time_limit'),
+            instance.__dict__.get('memory_limit'),
+            instance.__dict__.get('output_limit')
+        )
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """资源限制变化会影响判题结果，同样递增测试数据版本"""
+        loaded_limits = getattr(self, '_loaded_limits', None)
+        limits_changed = (
+            loaded_limits is not None
+            and None not in loaded_limits
+            and loaded_limits != (self.time_limit, self.memory_limit, self.output_limit)
+        )
+        if limits_changed:
+            self.testdata_version = F('testdata_version') + 1
+        super().save(*args, **kwargs)
+        if limits_changed:
+            self.refresh_from_db(fields=['testdata_version'])
+            self._loaded_limits = (self.time_limit, self.memory_limit, self.output_limit)
+    
     @property
     def acceptance_rate(self):
         """通过率"""
@@ -147,14 +194,29 @@ class ProblemSample(models.Model):
 
 class TestCase(models.Model):
     """测试用例"""
+    # 体积较大的列（未迁移到测试数据存储的旧数据），列表查询不加载
+    HEAVY_FIELDS = ('input_data', 'output_data')
+    
     problem = models.ForeignKey(
         Problem,
         on_delete=models.CASCADE,
         related_name='test_cases',
         verbose_name='题目'
     )
-    input_data = models.TextField(verbose_name='输入数据')
-    output_data = models.TextField(verbose_name='输出数据')
+    # 新填写的数据（空字符串也是合法的数据），保存时写入测试数据存储后置为NULL，
+    # 数据库中只保留哈希、大小和行数；为None时保存不改动存储中的数据
+    input_data = models.TextField(null=True, blank=True, verbose_name='输入数据')
+    output_data = models.TextField(null=True, blank=True, verbose_name='输出数据')
+    
+    input_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='输入数据哈希')
+    input_size = models.BigIntegerField(default=0, editable=False, verbose_name='输入数据大小(字节)')
+    input_lines = models.IntegerField(default=0, editable=False, verbose_name='输入数据行数')
+    output_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='输出数据哈希')
+    output_size = models.BigIntegerField(default=0, editable=False, verbose_name='输出数据大小(字节)')
+    output_lines = models.IntegerField(default=0, editable=False, verbose_name='输出数据行数')
+    # 数据开头的文本，列表和后台预览使用，不必读取存储
+    input_excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False, verbose_name='输入预览')
+    output_excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False, verbose_name='输出预览')
     
     # 属性
     is_sample = models.BooleanField(default=False, verbose_name='是否为样例')
@@ -196,6 +258,68 @@ class TestCase(models.Model):
     def get_memory_limit(self):
         """获取实际内存限制"""
         return self.memory_limit if self.memory_limit is not None else self.problem.memory_limit
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 早期版本写入存储后把数据列置为空字符串，读出时同样视为未修改
+        for kind in ('input', 'output'):
+            if instance.__dict__.get(f'{kind}_data') == '' and instance.__dict__.get(f'{kind}_hash'):
+                setattr(instance, f'{kind}_data', None)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """把新填写的输入输出数据写入测试数据存储，数据为None时保持原数据不变"""
+        deferred = self.get_deferred_fields()
+        stored = []
+        for kind in ('input', 'output'):
+            if f'{kind}_data' in deferred:
+                continue
+            data = getattr(self, f'{kind}_data')
+            if data is None and getattr(self, f'{kind}_hash'):
+                continue
+            self.set_data(kind, '' if data is None else data)
+            stored.append(kind)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and stored:
+            kwargs['update_fields'] = set(update_fields) | {
+                f'{kind}_{field}' for kind in stored
+                for field in ('data', 'hash', 'size', 'lines', 'excerpt')
+            }
+        super().save(*args, **kwargs)
+    
+    def set_data(self, kind, data):
+        """写入输入(kind='input')或输出(kind='output')数据，data可以是字符串、字节串或二进制流"""
+        store = get_testdata_store()
+        info = store.put_stream(data) if hasattr(data, 'read') else store.put(data)
+        setattr(self, f'{kind}_data', None)
+        setattr(self, f'{kind}_hash', info.digest)
+        setattr(self, f'{kind}_size', info.size)
+        setattr(self, f'{kind}_lines', info.lines)
+        setattr(self, f'{kind}_excerpt', make_excerpt(store.read(info.digest, EXCERPT_LENGTH * 4)))
+    
+    def open_data(self, kind):
+        """以二进制流打开输入或输出数据"""
+        digest = getattr(self, f'{kind}_hash')
+        if not digest:
+            # 尚未迁移到测试数据存储的旧数据
+            return io.BytesIO((getattr(self, f'{kind}_data') or '').encode('utf-8'))
+        return get_testdata_store().open(digest)
+    
+    def read_data(self, kind, limit=None):
+        """读取输入或输出数据（字节串），limit限制读取的字节数"""
+        with self.open_data(kind) as f:
+            return f.read() if limit is None else f.read(limit)
+    
+    def copy_data_to(self, kind, dest):
+        """把输入或输出数据复制到文件dest"""
+        digest = getattr(self, f'{kind}_hash')
+        if not digest:
+            with open(dest, 'wb') as f:
+                f.write((getattr(self, f'{kind}_data') or '').encode('utf-8'))
+            return
+        get_testdata_store().copy_to(digest, dest)
 
 
 class UserProblemStatus(models.Model):
@@ -245,4 +369,3 @@ class UserProblemStatus(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.problem.title} - {self.get_status_display()}"
-
@@ -12,6 +12,10 @@ class ProblemTagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'color', 'description', 'problem_count']
     
     def get_problem_count(self, obj):
+        # 列表接口已一次统计好所有标签的题目数
+        counts = self.context.get('tag_problem_counts')
+        if counts is not None:
+            return counts.get(obj.id, 0)
         return obj.problems.filter(status='published').count()
 
 
@@ -48,15 +52,19 @@ class ProblemListSerializer(serializers.ModelSerializer):
         """获取当前用户的题目状态"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            try:
-                status = UserProblemStatus.objects.get(user=request.user, problem=obj)
-                return {
-                    'status': status.status,
-                    'submit_count': status.submit_count,
-                    'accepted_count': status.accepted_count,
-                }
-            except UserProblemStatus.DoesNotExist:
+            # 列表接口已一次查出本页所有题目的状态
+            statuses = self.context.get('user_statuses')
+            if statuses is not None:
+                status = statuses.get(obj.id)
+            else:
+                status = UserProblemStatus.objects.filter(user=request.user, problem=obj).first()
+            if status is None:
                 return {'status': 'not_tried', 'submit_count': 0, 'accepted_count': 0}
+            return {
+                'status': status.status,
+                'submit_count': status.submit_count,
+                'accepted_count': status.accepted_count,
+            }
         return None
 
 
@@ -82,6 +90,7 @@ class ProblemDetailSerializer(serializers.ModelSerializer):
             'source',
             'time_limit',
             'memory_limit',
+            'output_limit',
             'difficulty',
             'difficulty_display',
             'status',
@@ -142,6 +151,7 @@ class ProblemCreateUpdateSerializer(serializers.ModelSerializer):
             'source',
             'time_limit',
             'memory_limit',
+            'output_limit',
             'difficulty',
             'status',
             'tag_ids',
@@ -197,8 +207,41 @@ class ProblemCreateUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
+class TestCaseListSerializer(serializers.ModelSerializer):
+    """测试用例列表序列化器（只返回预览，完整数据通过详情接口获取）"""
+    time_limit_display = serializers.SerializerMethodField()
+    memory_limit_display = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TestCase
+        fields = [
+            'id',
+            'input_excerpt',
+            'input_size',
+            'input_lines',
+            'output_excerpt',
+            'output_size',
+            'output_lines',
+            'is_sample',
+            'score',
+            'order',
+            'time_limit',
+            'memory_limit',
+            'time_limit_display',
+            'memory_limit_display',
+        ]
+    
+    def get_time_limit_display(self, obj):
+        return obj.get_time_limit()
+    
+    def get_memory_limit_display(self, obj):
+        return obj.get_memory_limit()
+
+
 class TestCaseSerializer(serializers.ModelSerializer):
     """测试用例序列化器（管理员使用）"""
+    input_data = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
+    output_data = serializers.CharField(required=False, allow_blank=True, trim_whitespace=False)
     time_limit_display = serializers.SerializerMethodField()
     memory_limit_display = serializers.SerializerMethodField()
     
@@ -208,6 +251,12 @@ class TestCaseSerializer(serializers.ModelSerializer):
             'id',
             'input_data',
             'output_data',
+            'input_hash',
+            'input_size',
+            'input_lines',
+            'output_hash',
+            'output_size',
+            'output_lines',
             'is_sample',
             'score',
             'order',
@@ -222,6 +271,13 @@ class TestCaseSerializer(serializers.ModelSerializer):
     
     def get_memory_limit_display(self, obj):
         return obj.get_memory_limit()
+    
+    def to_representation(self, instance):
+        """输入输出数据从测试数据存储读取"""
+        data = super().to_representation(instance)
+        data['input_data'] = instance.read_data('input').decode('utf-8', errors='replace')
+        data['output_data'] = instance.read_data('output').decode('utf-8', errors='replace')
+        return data
 
 
 class UserProblemStatusSerializer(serializers.ModelSerializer):
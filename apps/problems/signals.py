@@ -0,0 +1,13 @@
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Problem, TestCase
+
+
+@receiver(post_save, sender=TestCase)
+@receiver(post_delete, sender=TestCase)
+def bump_testdata_version(sender, instance, **kwargs):
+    """测试用例增删改时递增题目的测试数据版本，使判题结果缓存失效"""
+    Problem.objects.filter(pk=instance.problem_id).update(
+        testdata_version=F('testdata_version') + 1
+    )
@@ -0,0 +1,144 @@
+"""
+测试数据存储
+测试用例的输入输出按内容的sha256保存为文件（内容寻址，相同的数据只存一份），
+数据库只记录哈希、大小和行数，判题时直接从文件复制到工作目录、流式比对。
+数据按字节保存，可以是任意二进制内容。
+
+目录结构：{TESTDATA_ROOT}/ab/cd/abcd...，开启压缩时保存为 .zst 文件（需要安装zstandard）。
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+try:
+    import zstandard
+except ImportError:  # 未安装时只能使用不压缩的存储
+    zstandard = None
+
+
+# 流式读写的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 压缩文件后缀
+COMPRESSED_SUFFIX = '.zst'
+
+
+class TestDataInfo:
+    """写入存储后的数据信息"""
+
+    def __init__(self, digest, size, lines):
+        self.digest = digest
+        self.size = size
+        self.lines = lines
+
+
+class TestDataStore:
+    """内容寻址的测试数据存储"""
+
+    def __init__(self, root=None, compress=None):
+        self.root = str(root or settings.TESTDATA_ROOT)
+        self.compress = settings.TESTDATA_COMPRESS if compress is None else compress
+        if self.compress and zstandard is None:
+            raise ImportError('TESTDATA_COMPRESS 需要安装 zstandard')
+
+    def path(self, digest):
+        """未压缩数据的文件路径"""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        path = self.path(digest)
+        return os.path.exists(path) or os.path.exists(path + COMPRESSED_SUFFIX)
+
+    def put(self, data):
+        """写入字节串或字符串（按UTF-8编码），返回 TestDataInfo"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        return self.put_stream(io.BytesIO(data))
+
+    def put_stream(self, stream):
+        """从二进制流写入数据，边读边计算哈希，返回 TestDataInfo"""
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        sha256 = hashlib.sha256()
+        size = 0
+        newlines = 0
+        last_byte = b''
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                writer = zstandard.ZstdCompressor().stream_writer(f) if self.compress else f
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    newlines += chunk.count(b'\n')
+                    last_byte = chunk[-1:]
+                    writer.write(chunk)
+                if self.compress:
+                    writer.flush(zstandard.FLUSH_FRAME)
+
+            digest = sha256.hexdigest()
+            target = self.path(digest) + (COMPRESSED_SUFFIX if self.compress else '')
+            if self.exists(digest):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.chmod(tmp_path, 0o444)
+                os.replace(tmp_path, target)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        # 最后一行没有换行符时也算一行
+        lines = newlines + (1 if last_byte and last_byte != b'\n' else 0)
+        return TestDataInfo(digest, size, lines)
+
+    def open(self, digest):
+        """以二进制流打开数据"""
+        path = self.path(digest)
+        if os.path.exists(path):
+            return open(path, 'rb')
+        if zstandard is None:
+            raise FileNotFoundError(f'测试数据不存在或需要安装zstandard解压: {digest}')
+        return zstandard.ZstdDecompressor().stream_reader(open(path + COMPRESSED_SUFFIX, 'rb'), closefd=True)
+
+    def read(self, digest, limit=None):
+        """读取数据，limit限制读取的字节数"""
+        with self.open(digest) as f:
+            return f.read() if limit is None else f.read(limit)
+
+    def copy_to(self, digest, dest):
+        """
+        把数据复制到dest
+
+        未压缩时由内核完成复制（sendfile），不经过Python内存。
+        不使用硬链接：沙箱内的程序可以写工作目录中的文件，硬链接会让它改动存储中的数据
+        """
+        path = self.path(digest)
+        if os.path.exists(path):
+            shutil.copyfile(path, dest)
+            return
+        with self.open(digest) as src, open(dest, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+_store = None
+
+
+def get_testdata_store():
+    """获取进程内共享的测试数据存储"""
+    global _store
+    if _store is None:
+        _store = TestDataStore()
+    return _store
@@ -0,0 +1,152 @@
+"""
+测试数据压缩包导入导出
+压缩包中是成对的 N.in / N.out 文件（N为正整数，可以放在任意子目录下），按N的数值顺序
+对应测试用例的顺序。导入时逐个文件流式解压写入测试数据存储，不把压缩包或单个文件整个读入内存，
+全部写入存储后在一个事务中批量创建测试用例；导出时边读存储边压缩输出。
+"""
+
+import os
+import re
+import time
+import zipfile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import Problem, TestCase
+from .testdata import CHUNK_SIZE
+
+
+# 压缩包中测试数据文件名
+NAME_PATTERN = re.compile(r'^(\d+)\.(in|out)$')
+
+# 压缩包中最多的文件数
+MAX_ENTRIES = 2000
+
+
+class TestDataArchiveError(ValueError):
+    """压缩包格式或内容不正确"""
+
+
+def read_archive_entries(archive):
+    """检查压缩包，返回 [(编号, 输入文件ZipInfo, 输出文件ZipInfo)]，按编号排序"""
+    infos = [info for info in archive.infolist() if not info.is_dir()]
+    if len(infos) > MAX_ENTRIES:
+        raise TestDataArchiveError(f'压缩包中的文件超过 {MAX_ENTRIES} 个')
+
+    total_size = sum(info.file_size for info in infos)
+    max_size = settings.TESTDATA_ARCHIVE_MAX_SIZE * 1024 * 1024
+    if total_size > max_size:
+        raise TestDataArchiveError(f'解压后的大小超过 {settings.TESTDATA_ARCHIVE_MAX_SIZE}MB')
+
+    pairs = {}
+    for info in infos:
+        name = os.path.basename(info.filename)
+        # 忽略系统生成的隐藏文件（如 __MACOSX/、.DS_Store）
+        if name.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        match = NAME_PATTERN.match(name)
+        if not match:
+            raise TestDataArchiveError(f'无法识别的文件: {info.filename}（应为 N.in 或 N.out）')
+        number, kind = int(match.group(1)), match.group(2)
+        pair = pairs.setdefault(number, {})
+        if kind in pair:
+            raise TestDataArchiveError(f'测试点 {number} 有多个 .{kind} 文件')
+        pair[kind] = info
+
+    if not pairs:
+        raise TestDataArchiveError('压缩包中没有测试数据')
+    unpaired = [f"{number}.{'out' if 'in' in pair else 'in'}"
+                for number, pair in sorted(pairs.items()) if len(pair) != 2]
+    if unpaired:
+        raise TestDataArchiveError(f"缺少文件: {', '.join(unpaired)}")
+
+    return [(number, pair['in'], pair['out']) for number, pair in sorted(pairs.items())]
+
+
+def import_testcases(problem, fileobj, replace=False):
+    """
+    从zip压缩包导入测试用例，返回创建的测试用例数
+
+    fileobj需要支持seek（Django上传的文件满足），replace为True时先删除题目原有的测试用例
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise TestDataArchiveError('不是有效的zip文件')
+
+    with archive:
+        entries = read_archive_entries(archive)
+
+        # 先写入存储（内容寻址，导入失败时留下的文件不会被引用，也不影响已有数据）
+        testcases = []
+        for _, input_info, output_info in entries:
+            testcase = TestCase(problem=problem)
+            for kind, info in (('input', input_info), ('output', output_info)):
+                try:
+                    with archive.open(info) as src:
+                        testcase.set_data(kind, src)
+                except (zipfile.BadZipFile, zipfile.LargeZipFile, NotImplementedError, RuntimeError) as e:
+                    raise TestDataArchiveError(f'解压 {info.filename} 失败: {e}')
+            testcases.append(testcase)
+
+    with transaction.atomic():
+        # 锁定题目，避免同时导入时测试点顺序冲突
+        Problem.objects.select_for_update().filter(pk=problem.pk).first()
+        if replace:
+            problem.test_cases.all().delete()
+            start = 0
+        else:
+            last_order = problem.test_cases.aggregate(last=Max('order'))['last']
+            start = 0 if last_order is None else last_order + 1
+        for idx, testcase in enumerate(testcases):
+            testcase.order = start + idx
+        TestCase.objects.bulk_create(testcases)
+
+        # bulk_create不发送post_save信号，在这里递增一次测试数据版本
+        Problem.objects.filter(pk=problem.pk).update(testdata_version=F('testdata_version') + 1)
+
+    print(f"[TestData] 题目 {problem.id} 导入 {len(testcases)} 个测试用例")
+    return len(testcases)
+
+
+class _StreamBuffer:
+    """zipfile写入的目标，收集写入的数据供生成器取走"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_testcases(problem):
+    """把题目的测试用例导出为zip压缩包，逐块生成压缩后的数据（用于StreamingHttpResponse）"""
+    buffer = _StreamBuffer()
+    testcases = problem.test_cases.order_by('order', 'id')
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for idx, testcase in enumerate(testcases.iterator(), 1):
+            for kind, suffix in (('input', 'in'), ('output', 'out')):
+                info = zipfile.ZipInfo(f'{idx}.{suffix}', date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with testcase.open_data(kind) as src, archive.open(info, 'w', force_zip64=True) as dest:
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.take()
+                        if data:
+                            yield data
+    # 剩余数据和关闭压缩包时写入的中央目录
+    yield buffer.take()
@@ -0,0 +1,102 @@
+"""
+用户题目状态维护
+判题结果保存时在同一事务中增量更新 UserProblemStatus（不从提交记录重新统计），
+rebuild_user_status 命令用 rebuild_for_users 按用户分批从提交记录重建。
+
+提交是否计入按 apps.judge.counting 的定义，与题目的提交数一致（编译错误和系统错误不计入）。
+用户资料上的总提交数、尝试题目数、通过题目数随状态变化用F()自增，不再每次COUNT。
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+
+from .models import UserProblemStatus
+from apps.judge.counting import COUNTED_FILTER, counted
+from apps.judge.models import Submission
+from apps.users.models import UserProfile
+
+
+def status_for(submit_count, accepted_count):
+    if accepted_count > 0:
+        return 'accepted'
+    if submit_count > 0:
+        return 'trying'
+    return 'not_tried'
+
+
+def record_judge_result(submission, previous_result=None):
+    """
+    判题结果写入后更新用户题目状态，需在保存判题结果的事务中调用
+
+    previous_result 为重新判题前的结果（首次判题为None），重判时只按结果变化增减
+    """
+    result = submission.result
+    submit_delta = counted(result) - counted(previous_result)
+    accepted_delta = (result == 'AC') - (previous_result == 'AC')
+    if not submit_delta and not accepted_delta:
+        return
+
+    # 锁定该用户该题的状态行，同一用户同时判完的提交依次更新
+    status, _ = UserProblemStatus.objects.select_for_update().get_or_create(
+        user_id=submission.user_id,
+        problem_id=submission.problem_id,
+    )
+    was_tried = status.submit_count > 0
+    was_accepted = status.accepted_count > 0
+    status.submit_count += submit_delta
+    status.accepted_count += accepted_delta
+    if submit_delta > 0 and (status.last_submit_at is None or submission.created_at > status.last_submit_at):
+        status.last_submit_at = submission.created_at
+    if accepted_delta > 0:
+        if status.first_accepted_at is None or submission.created_at < status.first_accepted_at:
+            status.first_accepted_at = submission.created_at
+    elif accepted_delta < 0:
+        # 重判后不再通过，首次通过时间改为剩余通过提交中最早的
+        status.first_accepted_at = Submission.objects.filter(
+            user_id=submission.user_id,
+            problem_id=submission.problem_id,
+            result='AC',
+        ).aggregate(first=Min('created_at'))['first']
+    status.status = status_for(status.submit_count, status.accepted_count)
+    status.save()
+
+    # 用户资料计数单条UPDATE自增；尝试、通过题目数只在该题状态变化时改变
+    UserProfile.objects.filter(user_id=submission.user_id).update(
+        total_submit=F('total_submit') + submit_delta,
+        total_tried=F('total_tried') + ((status.submit_count > 0) - was_tried),
+        total_accepted=F('total_accepted') + ((status.accepted_count > 0) - was_accepted),
+    )
+
+
+def rebuild_for_users(user_ids):
+    """从提交记录重建这些用户的题目状态，返回重建后的状态列表"""
+    accepted_filter = Q(result='AC')
+    rows = (
+        Submission.objects
+        .filter(user_id__in=user_ids)
+        .values('user_id', 'problem_id')
+        .annotate(
+            submit_count=Count('id', filter=COUNTED_FILTER),
+            accepted_count=Count('id', filter=accepted_filter),
+            first_accepted_at=Min('created_at', filter=accepted_filter),
+            last_submit_at=Max('created_at', filter=COUNTED_FILTER),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        statuses = [
+            UserProblemStatus(
+                user_id=row['user_id'],
+                problem_id=row['problem_id'],
+                status=status_for(row['submit_count'], row['accepted_count']),
+                submit_count=row['submit_count'],
+                accepted_count=row['accepted_count'],
+                first_accepted_at=row['first_accepted_at'],
+                last_submit_at=row['last_submit_at'],
+            )
+            for row in rows
+            if row['submit_count'] or row['accepted_count']
+        ]
+        UserProblemStatus.objects.filter(user_id__in=user_ids).delete()
+        UserProblemStatus.objects.bulk_create(statuses)
+    return statuses
@@ -1,11 +1,13 @@
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
 
 from .models import Problem, ProblemTag, TestCase, UserProblemStatus
 from .serializers import (
@@ -14,10 +16,21 @@ from .serializers import (
     ProblemCreateUpdateSerializer,
     ProblemTagSerializer,
     TestCaseSerializer,
+    TestCaseListSerializer,
     UserProblemStatusSerializer,
 )
 from apps.users.decorators import teacher_required
 from .permissions import IsTeacherOrAdmin, IsOwnerOrTeacherOrAdmin
+from .testdata_archive import TestDataArchiveError, export_testcases, import_testcases
+
+
+def tag_problem_counts():
+    """每个标签下已发布的题目数 {标签ID: 题目数}"""
+    return dict(
+        ProblemTag.objects.annotate(
+            count=Count('problems', filter=Q(problems__status='published'))
+        ).values_list('id', 'count')
+    )
 
 
 class ProblemViewSet(viewsets.ModelViewSet):
@@ -42,6 +55,10 @@ class ProblemViewSet(viewsets.ModelViewSet):
         """获取查询集"""
         queryset = super().get_queryset()
         
+        # 列表只显示标题和统计，不读取题面
+        if self.action == 'list':
+            queryset = queryset.defer(*Problem.HEAVY_FIELDS)
+        
         # 非管理员只能看到已发布的题目
         if not self.request.user.is_staff:
             queryset = queryset.filter(status='published')
@@ -73,14 +90,37 @@ class ProblemViewSet(viewsets.ModelViewSet):
                 ).values_list('problem_id', flat=True)
                 queryset = queryset.exclude(id__in=tried_problem_ids)
         
+        if self.action == 'list':
+            return queryset.prefetch_related('tags')
         return queryset.prefetch_related('tags', 'samples')
     
+    def list(self, request, *args, **kwargs):
+        """题目列表：本页题目的用户状态和标签题目数各用一次查询取出"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        problems = page if page is not None else list(queryset)
+        
+        context = self.get_serializer_context()
+        context['tag_problem_counts'] = tag_problem_counts()
+        if request.user.is_authenticated:
+            context['user_statuses'] = {
+                status.problem_id: status
+                for status in UserProblemStatus.objects.filter(
+                    user=request.user, problem_id__in=[problem.id for problem in problems]
+                )
+            }
+        
+        serializer = self.get_serializer_class()(problems, many=True, context=context)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
     def testcases(self, request, pk=None):
-        """获取题目的测试用例（管理员）"""
+        """获取题目的测试用例列表（管理员），完整数据通过测试用例详情接口获取"""
         problem = self.get_object()
-        testcases = problem.test_cases.all()
-        serializer = TestCaseSerializer(testcases, many=True)
+        testcases = problem.test_cases.defer(*TestCase.HEAVY_FIELDS).select_related('problem')
+        serializer = TestCaseListSerializer(testcases, many=True)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAdminUser])
@@ -92,6 +132,34 @@ class ProblemViewSet(viewsets.ModelViewSet):
             serializer.save(problem=problem)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAdminUser], parser_classes=[MultiPartParser])
+    def import_testcases(self, request, pk=None):
+        """从zip压缩包批量导入测试用例（管理员），replace=true时替换原有的测试用例"""
+        problem = self.get_object()
+        archive = request.FILES.get('file')
+        if archive is None:
+            return Response({'error': '请上传zip压缩包（file）'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        replace = str(request.data.get('replace', '')).lower() in ('1', 'true', 'yes')
+        try:
+            count = import_testcases(problem, archive, replace=replace)
+        except TestDataArchiveError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'created': count,
+            'total': problem.test_cases.count(),
+            'message': f'成功导入 {count} 个测试用例'
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+    def export_testcases(self, request, pk=None):
+        """把测试用例导出为zip压缩包（管理员）"""
+        problem = self.get_object()
+        response = StreamingHttpResponse(export_testcases(problem), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="problem_{problem.id}_testcases.zip"'
+        return response
 
 
 class ProblemTagViewSet(viewsets.ModelViewSet):
@@ -106,6 +174,13 @@ class ProblemTagViewSet(viewsets.ModelViewSet):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAdminUser()]
         return [AllowAny()]
+    
+    def get_serializer_context(self):
+        """列表一次统计所有标签的题目数"""
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            context['tag_problem_counts'] = tag_problem_counts()
+        return context
 
 
 class TestCaseViewSet(viewsets.ModelViewSet):
@@ -114,9 +189,17 @@ class TestCaseViewSet(viewsets.ModelViewSet):
     serializer_class = TestCaseSerializer
     permission_classes = [IsAdminUser]
     
+    def get_serializer_class(self):
+        """列表只返回预览"""
+        if self.action == 'list':
+            return TestCaseListSerializer
+        return TestCaseSerializer
+    
     def get_queryset(self):
         """获取查询集"""
         queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.defer(*TestCase.HEAVY_FIELDS).select_related('problem')
         problem_id = self.request.query_params.get('problem_id', None)
         if problem_id:
             queryset = queryset.filter(problem_id=problem_id)
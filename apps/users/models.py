@@ -104,21 +104,24 @@ class UserProfile(models.Model):
         return self.user_type == 'admin' or self.user.is_superuser
     
     def update_stats(self):
-        """更新统计信息"""
+        """
+        从用户题目状态重新统计
+
+        判题时计数已增量更新，这里只用于修正数据；提交数按 apps.judge.counting 的定义统计
+        """
+        from django.db.models import Count, Q
+        from apps.judge.counting import COUNTED_FILTER
+        from apps.judge.models import Submission
         from apps.problems.models import UserProblemStatus
         
-        # 更新通过题目数
-        self.total_accepted = UserProblemStatus.objects.filter(
-            user=self.user,
-            status='accepted'
-        ).count()
-        
-        # 更新尝试题目数
-        self.total_tried = UserProblemStatus.objects.filter(
-            user=self.user
-        ).exclude(status='not_tried').count()
-        
-        self.save()
+        stats = UserProblemStatus.objects.filter(user=self.user).aggregate(
+            accepted=Count('id', filter=Q(status='accepted')),
+            tried=Count('id', filter=~Q(status='not_tried')),
+        )
+        self.total_submit = Submission.objects.filter(COUNTED_FILTER, user=self.user).count()
+        self.total_accepted = stats['accepted']
+        self.total_tried = stats['tried']
+        self.save(update_fields=['total_submit', 'total_accepted', 'total_tried'])
 
 
 class Class(models.Model):
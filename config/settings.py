@@ -136,6 +136,11 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 测试数据存储（按内容哈希保存的测试用例文件）
+TESTDATA_ROOT = config('TESTDATA_ROOT', default=str(BASE_DIR / 'testdata'))  # 存储根目录，多台判题机需要共享
+TESTDATA_COMPRESS = config('TESTDATA_COMPRESS', default=False, cast=bool)  # 新写入的数据用zstd压缩（需要安装zstandard）
+TESTDATA_ARCHIVE_MAX_SIZE = config('TESTDATA_ARCHIVE_MAX_SIZE', default=1024, cast=int)  # 导入的测试数据压缩包解压后的大小上限(MB)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -172,3 +177,54 @@ if not DEBUG:
     SECURE_HSTS_SECONDS = 31536000
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
+
+# 判题沙箱容器池
+JUDGE_POOL_MAX_SIZE = config('JUDGE_POOL_MAX_SIZE', default=4, cast=int)  # 每个镜像最多保留的容器数
+JUDGE_POOL_IDLE_TIMEOUT = config('JUDGE_POOL_IDLE_TIMEOUT', default=300, cast=int)  # 空闲容器回收时间(秒)
+JUDGE_POOL_PREWARM = config('JUDGE_POOL_PREWARM', default=1, cast=int)  # 判题进程启动时为每个启用语言的镜像预先启动的容器数，空闲回收时每个镜像至少保留这么多
+JUDGE_RUNNER_PATH = config('JUDGE_RUNNER_PATH', default='/opt/judge/runner.py')  # 判题镜像内运行器路径
+JUDGE_RUNNER_CGROUP = config('JUDGE_RUNNER_CGROUP', default='')  # 运行器使用的cgroup v2目录（Docker后端为容器内路径，留空自动检测；本地后端在其下为每次判题创建子组），不可用时使用rusage统计
+
+# 判题进程（python manage.py judge_worker）
+JUDGE_WORKER_CONCURRENCY = config('JUDGE_WORKER_CONCURRENCY', default=2, cast=int)  # 每个判题进程同时判题的提交数
+JUDGE_WORKER_POLL_INTERVAL = config('JUDGE_WORKER_POLL_INTERVAL', default=1.0, cast=float)  # 队列为空时的轮询间隔(秒)
+JUDGE_USER_INFLIGHT_LIMIT = config('JUDGE_USER_INFLIGHT_LIMIT', default=2, cast=int)  # 每个用户同时在判的提交数上限
+JUDGE_NODE_NAME = config('JUDGE_NODE_NAME', default='')  # 判题节点名称，默认使用主机名
+JUDGE_HEARTBEAT_INTERVAL = config('JUDGE_HEARTBEAT_INTERVAL', default=5, cast=int)  # 节点心跳间隔(秒)
+JUDGE_NODE_TIMEOUT = config('JUDGE_NODE_TIMEOUT', default=60, cast=int)  # 超过该时间没有心跳的节点视为离线(秒)
+JUDGE_LEASE_TIMEOUT = config('JUDGE_LEASE_TIMEOUT', default=60, cast=int)  # 判题租约时长(秒)，判题节点每次心跳续期
+JUDGE_DEADLINE_EXTRA = config('JUDGE_DEADLINE_EXTRA', default=120, cast=int)  # 判题截止时间在编译超时和用例墙上时间之和外的余量(秒)，用于拉取测试数据、启动沙箱等
+JUDGE_MAX_ATTEMPTS = config('JUDGE_MAX_ATTEMPTS', default=3, cast=int)  # 同一提交最多领取的次数，超过后标记为系统错误
+JUDGE_REJUDGE_BATCH_SIZE = config('JUDGE_REJUDGE_BATCH_SIZE', default=200, cast=int)  # 重新判题每批放入队列的提交数
+
+# 判题工作目录（建议使用单独挂载、限定大小的tmpfs，例如 mount -t tmpfs -o size=1g,mode=700 tmpfs /dev/shm/oj-judge）
+JUDGE_WORKSPACE_ROOT = config('JUDGE_WORKSPACE_ROOT', default='/dev/shm/oj-judge')  # 工作目录池根目录
+JUDGE_WORKSPACE_SLOTS = config('JUDGE_WORKSPACE_SLOTS', default=16, cast=int)  # 节点上的工作目录数量，需不少于同时存在的沙箱数
+JUDGE_WORKSPACE_MAX_SIZE = config('JUDGE_WORKSPACE_MAX_SIZE', default=1024, cast=int)  # 工作目录池根目录所在文件系统的大小上限(MB)，超过时拒绝判题，需单独挂载限定大小的tmpfs
+
+# 沙箱后端：docker（容器池）或 native（本地命名空间进程沙箱）
+JUDGE_SANDBOX_BACKEND = config('JUDGE_SANDBOX_BACKEND', default='docker')
+JUDGE_NATIVE_RUNNER_PATH = config('JUDGE_NATIVE_RUNNER_PATH', default=str(BASE_DIR / 'docker' / 'judge' / 'runner.py'))  # 本地沙箱使用的运行器
+JUDGE_NATIVE_PYTHON = config('JUDGE_NATIVE_PYTHON', default='/usr/bin/python3')  # 沙箱内执行运行器的Python（项目虚拟环境会被隐藏）
+JUDGE_NATIVE_SECCOMP = config('JUDGE_NATIVE_SECCOMP', default=True, cast=bool)  # 是否为用户程序加载seccomp过滤器
+JUDGE_NATIVE_SUBUID = config('JUDGE_NATIVE_SUBUID', default=0, cast=int)  # 映射为沙箱内判题用户的宿主机uid/gid（需在 /etc/subuid、/etc/subgid 中分配给判题进程的用户）
+JUDGE_NATIVE_HIDDEN_PATHS = config('JUDGE_NATIVE_HIDDEN_PATHS', default='/home,/root,/tmp,/var,/srv,/opt,/dev/shm', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])  # 沙箱内用空目录覆盖的路径
+
+# 测试用例并行运行
+JUDGE_PARALLEL = config('JUDGE_PARALLEL', default=False, cast=bool)  # 是否并行运行测试用例
+JUDGE_PARALLEL_CASES = config('JUDGE_PARALLEL_CASES', default=4, cast=int)  # 单次提交最多同时运行的用例数
+JUDGE_CPU_SET = config('JUDGE_CPU_SET', default='', cast=lambda v: [int(s) for s in v.split(',') if s.strip()])  # 判题可用的CPU编号，留空使用全部
+JUDGE_CPU_LOCK_DIR = config('JUDGE_CPU_LOCK_DIR', default='/tmp/oj-judge-cpus')  # 节点级CPU锁文件目录
+
+# 编译缓存
+JUDGE_COMPILE_CACHE = config('JUDGE_COMPILE_CACHE', default=True, cast=bool)  # 是否缓存编译结果
+JUDGE_COMPILE_CACHE_DIR = config('JUDGE_COMPILE_CACHE_DIR', default='/tmp/oj-judge-compile-cache')  # 缓存目录
+JUDGE_COMPILE_CACHE_SIZE = config('JUDGE_COMPILE_CACHE_SIZE', default=1024, cast=int)  # 缓存上限(MB)
+
+# 测试数据本地缓存（TESTDATA_ROOT 为网络存储时启用）
+JUDGE_TESTDATA_CACHE = config('JUDGE_TESTDATA_CACHE', default=False, cast=bool)  # 是否在判题节点本地缓存测试数据
+JUDGE_TESTDATA_CACHE_DIR = config('JUDGE_TESTDATA_CACHE_DIR', default='/var/cache/oj-judge/testdata')  # 缓存目录
+JUDGE_TESTDATA_CACHE_SIZE = config('JUDGE_TESTDATA_CACHE_SIZE', default=4096, cast=int)  # 缓存上限(MB)
+
+# 判题结果缓存（相同代码、相同测试数据直接复用结果）
+JUDGE_VERDICT_CACHE = config('JUDGE_VERDICT_CACHE', default=False, cast=bool)
@@ -144,16 +144,18 @@ def check_test_cases():
         else:
             # 检查测试用例数据
             for idx, tc in enumerate(problem.test_cases.all()[:2], 1):
-                has_input = bool(tc.input_data and tc.input_data.strip())
-                has_output = bool(tc.output_data and tc.output_data.strip())
+                input_data = tc.read_data('input')
+                output_data = tc.read_data('output')
+                has_input = bool(input_data.strip())
+                has_output = bool(output_data.strip())
                 
                 print(f"  - 测试用例{idx}:")
-                print(f"      输入: {'✓' if has_input else '❌ 空'} ({len(tc.input_data) if tc.input_data else 0} 字符)")
-                print(f"      输出: {'✓' if has_output else '❌ 空'} ({len(tc.output_data) if tc.output_data else 0} 字符)")
+                print(f"      输入: {'✓' if has_input else '❌ 空'} ({len(input_data)} 字节)")
+                print(f"      输出: {'✓' if has_output else '❌ 空'} ({len(output_data)} 字节)")
                 
-                if has_input and not tc.input_data.endswith('\n'):
+                if has_input and not input_data.endswith(b'\n'):
                     print("      ⚠️ 输入数据缺少换行符")
-                if has_output and not tc.output_data.endswith('\n'):
+                if has_output and not output_data.endswith(b'\n'):
                     print("      ⚠️ 输出数据缺少换行符")
         
         print()
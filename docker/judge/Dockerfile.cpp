@@ -27,6 +27,7 @@ RUN apt-get update && \
         gcc \
         libc6-dev \
         make \
+        python3-minimal \
         time && \
     apt-get clean && \
     rm -rf /var/lib/apt/lists/* /tmp/* /var/tmp/*
@@ -34,6 +35,9 @@ RUN apt-get update && \
 # 验证GCC版本
 RUN g++ --version
 
+# 判题运行器（一次容器调用运行全部测试用例）
+COPY runner.py /opt/judge/runner.py
+
 # 创建判题用户（非root）
 RUN useradd -u 10001 -m -s /bin/bash judger && \
     mkdir -p /workspace && \
@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+判题沙箱内的测试用例运行器
+
+读取判题清单(manifest)，在同一个容器内依次运行所有测试用例，
+每个用例结束后向标准输出写一行JSON结果，供判题机流式读取。
+
+用法: python3 runner.py /workspace/manifest.json
+
+清单格式:
+{
+    "command": "/workspace/main",
+    "cases": [
+        {"id": 1, "input": "in/1.in", "output": "out/1.out",
+         "time_limit": 1000, "memory_limit": 256, "output_limit": 65536}
+    ],
+    "stop_on_failure": true,
+    "stop_file": "ctl/stop",
+    "parallel": 1,
+    "cpus": [2, 3],
+    "cgroup": "/sys/fs/cgroup/judge",
+    "seccomp": false,
+    "uid": 10001,
+    "nonce": "..."
+}
+
+parallel > 1 时并行运行多个测试用例，cpus 非空时每个并行槽位绑定到一个CPU。
+某个用例出错后，编号更大的用例会被取消（正在运行的直接杀掉），编号更小的
+用例照常完成，因此结果与顺序运行时一致。判题机比对出错误时把出错用例编号
+写入停止文件，运行器据此取消后续用例。停止文件所在的目录由判题机创建，用户程序无法写入。
+
+资源统计：运行器所在的cgroup v2可写时（清单中的 cgroup 字段或 /proc/self/cgroup
+指向的目录），为每个用例创建子cgroup，按 memory.max 限制内存，从 memory.peak、
+cpu.stat 和 memory.events 读取峰值内存、CPU时间和OOM次数；否则退回 wait4 的
+rusage 统计。结果状态为 OK / TLE / MLE / OLE / RE。
+
+标准输出写入文件，用 RLIMIT_FSIZE 限制为 output_limit 字节，超出时进程立即被
+SIGXFSZ 终止（OLE）；标准错误单独通过管道读取，只保留开头 STDERR_LIMIT 字节，
+随结果一起输出，不会混入被比对的输出。
+
+清单中 seccomp 为真时，用户程序在exec前加载seccomp过滤器，禁止挂载、ptrace、
+内核模块等系统调用（需要 libseccomp 的Python绑定，缺失时拒绝运行）。
+
+清单中有 uid 时（运行器以root运行），用户程序在exec前切换到该用户和同名组。
+每行结果带上清单中的 nonce，判题机只接受带正确nonce的结果行；运行器把自身设为
+不可dump，同一用户的用户程序也无法通过 /proc/<pid>/fd 写入运行器的标准输出。
+
+只依赖Python标准库，需兼容判题镜像中的 Python 3.9。
+"""
+
+import errno
+import hashlib
+import json
+import os
+import resource
+import shlex
+import signal
+import sys
+import threading
+import time
+from collections import deque
+
+try:
+    import seccomp
+except ImportError:  # 判题镜像中没有libseccomp绑定，Docker自带seccomp配置
+    seccomp = None
+
+
+# 墙上时间限制 = CPU时间限制 * 倍数 + 余量，防止sleep等不占CPU的程序挂起
+WALL_TIME_FACTOR = 2
+WALL_TIME_EXTRA = 500  # ms
+
+# 结果中保留的标准错误字节数
+STDERR_LIMIT = 1000
+
+# 检查停止文件的间隔(秒)
+STOP_POLL_INTERVAL = 0.01
+
+# cgroup v2 挂载点
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+# 等待cgroup中的进程全部退出的最长时间(秒)
+CGROUP_DRAIN_TIMEOUT = 1.0
+
+# 用户程序禁止使用的系统调用
+BLOCKED_SYSCALLS = [
+    'ptrace', 'process_vm_readv', 'process_vm_writev',
+    'mount', 'umount2', 'pivot_root', 'chroot', 'unshare', 'setns',
+    'init_module', 'finit_module', 'delete_module',
+    'kexec_load', 'kexec_file_load', 'reboot', 'swapon', 'swapoff',
+    'bpf', 'perf_event_open', 'userfaultfd',
+    'keyctl', 'add_key', 'request_key',
+    'open_by_handle_at', 'name_to_handle_at',
+]
+
+_emit_lock = threading.Lock()
+
+
+def file_digest(path):
+    """计算文件的sha256，返回 (大小, 摘要)"""
+    if not os.path.exists(path):
+        return 0, None
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(65536)
+            if not chunk:
+                break
+            size += len(chunk)
+            sha.update(chunk)
+    return size, sha.hexdigest()
+
+
+def read_int(path):
+    """读取只有一个整数的cgroup文件，不存在或无法解析时返回None"""
+    try:
+        with open(path, 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_keyed(path):
+    """读取 "键 值" 格式的cgroup文件（cpu.stat、memory.events）"""
+    values = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1].isdigit():
+                    values[parts[0]] = int(parts[1])
+    except OSError:
+        pass
+    return values
+
+
+def write_file(path, content):
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+class CaseCgroups:
+    """为每个测试用例创建独立的cgroup v2子组，统计资源并限制内存"""
+
+    def __init__(self, base):
+        self.base = base
+
+    @classmethod
+    def setup(cls, base=None):
+        """准备cgroup，不可用（cgroup v1、只读挂载、权限不足）时返回None"""
+        try:
+            if not base:
+                base = cls._own_cgroup()
+            if base is None or not os.access(os.path.join(base, 'cgroup.procs'), os.W_OK):
+                return None
+
+            # cgroup v2 不允许有进程的组再开启子组控制器，先把运行器移到叶子组
+            leaf = os.path.join(base, 'runner')
+            os.makedirs(leaf, exist_ok=True)
+            write_file(os.path.join(leaf, 'cgroup.procs'), '0')
+            write_file(os.path.join(base, 'cgroup.subtree_control'), '+memory')
+        except OSError as e:
+            sys.stderr.write(f'runner: cgroup unavailable, using rusage: {e}\n')
+            return None
+
+        # pids控制器可选，用于限制fork炸弹
+        try:
+            write_file(os.path.join(base, 'cgroup.subtree_control'), '+pids')
+        except OSError:
+            pass
+        return cls(base)
+
+    @staticmethod
+    def _own_cgroup():
+        """从 /proc/self/cgroup 找到本进程所在的cgroup v2目录"""
+        try:
+            with open('/proc/self/cgroup', 'r') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return None
+        for line in lines:
+            if line.startswith('0::'):
+                path = os.path.join(CGROUP_ROOT, line[3:].lstrip('/'))
+                if os.path.exists(os.path.join(path, 'cgroup.controllers')):
+                    return path
+        return None
+
+    def create(self, case):
+        """为用例创建子组并设置内存限制，返回目录"""
+        path = os.path.join(self.base, f"case_{os.getpid()}_{case['id']}")
+        if os.path.isdir(path):
+            self.remove(path)
+        os.mkdir(path)
+
+        memory_bytes = case['memory_limit'] * 1024 * 1024
+        write_file(os.path.join(path, 'memory.max'), str(memory_bytes))
+        for name, value in (('memory.swap.max', '0'), ('pids.max', '64')):
+            if os.path.exists(os.path.join(path, name)):
+                write_file(os.path.join(path, name), value)
+        return path
+
+    @staticmethod
+    def stats(path):
+        """读取用例的峰值内存(KB)、CPU时间(ms)和OOM次数"""
+        peak = read_int(os.path.join(path, 'memory.peak'))
+        usage_usec = read_keyed(os.path.join(path, 'cpu.stat')).get('usage_usec')
+        oom_kill = read_keyed(os.path.join(path, 'memory.events')).get('oom_kill', 0)
+        return {
+            'memory': peak // 1024 if peak is not None else None,
+            'cpu_time': usage_usec // 1000 if usage_usec is not None else None,
+            'oom_kill': oom_kill,
+        }
+
+    @staticmethod
+    def kill(path):
+        """杀掉组内所有进程（包括脱离进程组的后台进程）"""
+        kill_file = os.path.join(path, 'cgroup.kill')
+        try:
+            if os.path.exists(kill_file):
+                write_file(kill_file, '1')
+                return
+            with open(os.path.join(path, 'cgroup.procs'), 'r') as f:
+                pids = [int(line) for line in f if line.strip()]
+        except OSError:
+            return
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def remove(self, path):
+        """删除子组，组内进程退出前需要重试"""
+        deadline = time.monotonic() + CGROUP_DRAIN_TIMEOUT
+        while True:
+            try:
+                os.rmdir(path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    sys.stderr.write(f'runner: failed to remove cgroup {path}\n')
+                    return
+                self.kill(path)
+                time.sleep(0.01)
+
+
+def build_syscall_filter():
+    """构造seccomp过滤器：默认允许，黑名单中的系统调用返回EPERM"""
+    syscall_filter = seccomp.SyscallFilter(defaction=seccomp.ALLOW)
+    for name in BLOCKED_SYSCALLS:
+        try:
+            syscall_filter.add_rule(seccomp.ERRNO(errno.EPERM), name)
+        except (RuntimeError, ValueError, OSError):
+            # 当前架构没有该系统调用
+            continue
+    return syscall_filter
+
+
+def set_non_dumpable():
+    """禁止同一用户的其他进程访问本进程的 /proc/<pid>/fd、mem 等"""
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.prctl(4, 0, 0, 0, 0)  # PR_SET_DUMPABLE
+    except (ImportError, OSError, AttributeError):
+        pass
+
+
+def spawn(argv, case, cpu=None, cgroup=None, syscall_filter=None, uid=None):
+    """fork并执行用户程序，返回 (子进程pid, 标准错误管道的读端)"""
+    stdin_fd = os.open(case['input'], os.O_RDONLY)
+    stdout_fd = os.open(case['output'], os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    stderr_read, stderr_write = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # 独立进程组，超时时可以整组杀掉
+            os.setpgid(0, 0)
+            if cgroup is not None:
+                # 在exec之前进入用例的cgroup，用户程序的全部资源都计入其中
+                fd = os.open(os.path.join(cgroup, 'cgroup.procs'), os.O_WRONLY)
+                os.write(fd, b'0')
+                os.close(fd)
+            os.dup2(stdin_fd, 0)
+            os.dup2(stdout_fd, 1)
+            os.dup2(stderr_write, 2)
+
+            if cpu is not None:
+                os.sched_setaffinity(0, {cpu})
+
+            cpu_seconds = case['time_limit'] // 1000 + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+            resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+            if case.get('output_limit'):
+                # 多留一个字节，输出恰好等于限制时不算超限
+                output_bytes = case['output_limit'] + 1
+                resource.setrlimit(resource.RLIMIT_FSIZE, (output_bytes, output_bytes))
+
+            if syscall_filter is not None:
+                syscall_filter.load()
+
+            if uid is not None:
+                # 最后切换用户：加入cgroup、设置rlimit都需要root，切换后用户程序无法再提高硬限制
+                os.setgroups([])
+                os.setgid(uid)
+                os.setuid(uid)
+
+            os.execvp(argv[0], argv)
+        except BaseException as e:
+            os.write(2, f'runner: {e}\n'.encode())
+        finally:
+            os._exit(127)
+
+    os.close(stdin_fd)
+    os.close(stdout_fd)
+    os.close(stderr_write)
+    return pid, stderr_read
+
+
+class StderrReader(threading.Thread):
+    """读取标准错误管道，只保留开头部分，其余读出后丢弃以免子进程阻塞"""
+
+    def __init__(self, fd):
+        super().__init__(daemon=True)
+        self.fd = fd
+        self.data = b''
+
+    def run(self):
+        try:
+            while True:
+                chunk = os.read(self.fd, 65536)
+                if not chunk:
+                    break
+                if len(self.data) < STDERR_LIMIT:
+                    self.data += chunk[:STDERR_LIMIT - len(self.data)]
+        finally:
+            os.close(self.fd)
+
+    def text(self):
+        return self.data.decode('utf-8', errors='replace')
+
+
+def kill_group(pid):
+    """杀掉子进程所在进程组"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_case(argv, case, scheduler, cpu=None, cgroups=None, syscall_filter=None, uid=None):
+    """运行单个测试用例并收集资源使用情况"""
+    time_limit = case['time_limit']
+    memory_limit = case['memory_limit'] * 1024  # KB
+    wall_limit = (time_limit * WALL_TIME_FACTOR + WALL_TIME_EXTRA) / 1000
+
+    cgroup = cgroups.create(case) if cgroups is not None else None
+
+    start = time.monotonic()
+    pid, stderr_fd = spawn(argv, case, cpu, cgroup, syscall_filter, uid)
+    stderr_reader = StderrReader(stderr_fd)
+    stderr_reader.start()
+    scheduler.started(case['id'], pid)
+
+    timed_out = threading.Event()
+
+    def on_timeout():
+        timed_out.set()
+        kill_group(pid)
+
+    timer = threading.Timer(wall_limit, on_timeout)
+    timer.start()
+    try:
+        _, wait_status, usage = os.wait4(pid, 0)
+    finally:
+        timer.cancel()
+        scheduler.finished(case['id'])
+    wall_time = int((time.monotonic() - start) * 1000)
+
+    # 清理可能残留的后台子进程
+    kill_group(pid)
+
+    stats = None
+    if cgroup is not None:
+        stats = cgroups.stats(cgroup)
+        cgroups.kill(cgroup)
+        cgroups.remove(cgroup)
+
+    # 子进程全部退出后管道关闭；脱离进程组的残留进程可能仍持有管道，不无限等待
+    stderr_reader.join(1)
+
+    exit_code = None
+    signum = 0
+    if os.WIFEXITED(wait_status):
+        exit_code = os.WEXITSTATUS(wait_status)
+    elif os.WIFSIGNALED(wait_status):
+        signum = os.WTERMSIG(wait_status)
+
+    # 优先使用cgroup统计（包含用户程序创建的所有进程），缺失时退回rusage
+    cpu_time = int((usage.ru_utime + usage.ru_stime) * 1000)
+    memory = usage.ru_maxrss  # KB
+    oom_killed = False
+    if stats is not None:
+        if stats['cpu_time'] is not None:
+            cpu_time = stats['cpu_time']
+        if stats['memory'] is not None:
+            memory = stats['memory']
+        oom_killed = stats['oom_kill'] > 0
+    else:
+        # 没有cgroup时只能由容器整体的内存限制触发OOM，被SIGKILL且不是超时即视为OOM
+        oom_killed = signum == signal.SIGKILL and not timed_out.is_set()
+
+    output_size, output_sha256 = file_digest(case['output'])
+    output_limit = case.get('output_limit')
+
+    if timed_out.is_set() or signum == signal.SIGXCPU or cpu_time > time_limit:
+        status = 'TLE'
+    elif oom_killed or memory > memory_limit:
+        status = 'MLE'
+    elif signum == signal.SIGXFSZ or (output_limit and output_size > output_limit):
+        status = 'OLE'
+    elif signum or exit_code != 0:
+        status = 'RE'
+    else:
+        status = 'OK'
+
+    return {
+        'id': case['id'],
+        'status': status,
+        'exit_code': exit_code,
+        'signal': signum,
+        'cpu_time': cpu_time,
+        'wall_time': wall_time,
+        'memory': memory,  # KB
+        'output_size': output_size,
+        'output_sha256': output_sha256,
+        'stderr': stderr_reader.text(),
+    }
+
+
+def emit(record, nonce=None):
+    """输出一行结果"""
+    if nonce is not None:
+        record = dict(record, nonce=nonce)
+    line = json.dumps(record, separators=(',', ':')) + '\n'
+    with _emit_lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+class Scheduler:
+    """测试用例调度：按编号分发用例，出错后取消编号更大的用例"""
+
+    def __init__(self, cases, stop_on_failure):
+        self.stop_on_failure = stop_on_failure
+        self._queue = deque(sorted(cases, key=lambda c: c['id']))
+        self._lock = threading.Lock()
+        self._running = {}  # case_id -> pid
+        self.stop_at = float('inf')
+
+    def next_case(self):
+        """取下一个需要运行的用例，没有则返回None"""
+        with self._lock:
+            if self._queue and self._queue[0]['id'] < self.stop_at:
+                return self._queue.popleft()
+            return None
+
+    def started(self, case_id, pid):
+        with self._lock:
+            self._running[case_id] = pid
+            cancelled = case_id > self.stop_at
+        if cancelled:
+            kill_group(pid)
+
+    def finished(self, case_id):
+        with self._lock:
+            self._running.pop(case_id, None)
+
+    def is_cancelled(self, case_id):
+        with self._lock:
+            return case_id > self.stop_at
+
+    def fail(self, case_id):
+        """用例出错：取消编号更大的用例"""
+        with self._lock:
+            if case_id >= self.stop_at:
+                return
+            self.stop_at = case_id
+            victims = [pid for cid, pid in self._running.items() if cid > case_id]
+        for pid in victims:
+            kill_group(pid)
+
+
+def read_stop_file(stop_file):
+    """读取停止文件中的出错用例编号，文件不存在返回None"""
+    try:
+        with open(stop_file, 'r') as f:
+            content = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return int(content) if content.isdigit() else 0
+
+
+def worker(argv, scheduler, cpu, cgroups=None, syscall_filter=None, uid=None, nonce=None):
+    """并行槽位：不断取用例运行"""
+    while True:
+        case = scheduler.next_case()
+        if case is None:
+            return
+
+        output_dir = os.path.dirname(case['output'])
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+        record = run_case(argv, case, scheduler, cpu, cgroups, syscall_filter, uid)
+        if scheduler.is_cancelled(case['id']):
+            continue
+        emit(record, nonce)
+
+        if scheduler.stop_on_failure and record['status'] != 'OK':
+            scheduler.fail(case['id'])
+
+
+def main():
+    if len(sys.argv) != 2:
+        sys.stderr.write('usage: runner.py MANIFEST\n')
+        return 2
+
+    manifest_path = sys.argv[1]
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    # 清单中的相对路径以清单所在目录为准
+    os.chdir(os.path.dirname(os.path.abspath(manifest_path)))
+    set_non_dumpable()
+
+    syscall_filter = None
+    if manifest.get('seccomp'):
+        if seccomp is None:
+            sys.stderr.write('runner: seccomp requested but the seccomp module is missing\n')
+            return 3
+        syscall_filter = build_syscall_filter()
+
+    argv = shlex.split(manifest['command'])
+    stop_file = manifest.get('stop_file')
+    scheduler = Scheduler(manifest['cases'], manifest.get('stop_on_failure', True))
+    # 必须在启动工作线程之前，运行器整个进程会被移入叶子cgroup
+    cgroups = CaseCgroups.setup(manifest.get('cgroup'))
+
+    # 只使用本进程允许运行的CPU
+    allowed = os.sched_getaffinity(0)
+    cpus = [cpu for cpu in manifest.get('cpus') or [] if cpu in allowed]
+    parallel = max(1, manifest.get('parallel', 1))
+    if cpus:
+        parallel = min(parallel, len(cpus))
+    slots = [cpus[i] if cpus else None for i in range(parallel)]
+
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(argv, scheduler, cpu, cgroups, syscall_filter, manifest.get('uid'), manifest.get('nonce')),
+            daemon=True,
+        )
+        for cpu in slots
+    ]
+    for thread in threads:
+        thread.start()
+
+    # 主线程监视停止文件
+    for thread in threads:
+        while thread.is_alive():
+            if stop_file:
+                failed_id = read_stop_file(stop_file)
+                if failed_id is not None:
+                    scheduler.fail(failed_id)
+            thread.join(STOP_POLL_INTERVAL)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -102,8 +102,8 @@ def fix_problem_data():
         # 显示现有测试用例
         for idx, tc in enumerate(problem.test_cases.all(), 1):
             print(f"  测试用例 {idx}:")
-            print(f"    输入: {repr(tc.input_data[:50])}")
-            print(f"    输出: {repr(tc.output_data[:50])}")
+            print(f"    输入: {repr(tc.read_data('input', 50))}")
+            print(f"    输出: {repr(tc.read_data('output', 50))}")
             print(f"    分数: {tc.score}")
     
     # 总结